@@ -8,7 +8,9 @@ def main():
         from PyQt5.QtWidgets import QApplication
     except Exception:
         from PySide6.QtWidgets import QApplication
+    from utils import init_download_directories
 
+    init_download_directories()
     app = QApplication(sys.argv)
     w = MainWindow()
     w.show()
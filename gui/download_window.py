@@ -17,8 +17,9 @@ except Exception:
         raise ImportError("PyQt5 or PySide6 is required to run the GUI. Install one of them.")
 
 from utils.search.get_artist_library import get_artist_library
-from utils import download_song, placeholders, sanitize_path
-from utils import config, get_config
+from utils.pipeline import pipeline_enabled, run_pipeline
+from utils import DownloadExecutor, placeholders, sanitize_path
+from utils import get_config
 import asyncio
 import threading
 from functools import partial
@@ -152,14 +153,48 @@ class DownloadWindow(QMainWindow):
         for track in missing_library:
             self._emit_add_signal.emit(track, True, True)
 
-        for track in missing_library:
-            print(f"- Downloading {track.get('title')} ({track.get('source')})")
-            await asyncio.to_thread(download_song, track)
-            print(f"- Download complete: {track.get('title')}")
-            self._emit_add_signal.emit(track, False, False)
+        # downloads run concurrently on the DownloadExecutor (download.workers per backend),
+        # mostly-missing albums as a single album download
+        with DownloadExecutor() as executor:
+            async def download(track, future):
+                print(f"- Downloading {track.get('title')} ({track.get('source')})")
+                try:
+                    await asyncio.wrap_future(future)
+                except Exception as e:
+                    print(f"- Download failed: {track.get('title')} ({e})")
+                    return
+                print(f"- Download complete: {track.get('title')}")
+                self._emit_add_signal.emit(track, False, False)
+
+            futures = executor.submit_all(missing_library)
+            await asyncio.gather(*(download(track, future) for track, future in zip(missing_library, futures)))
+
+    async def _pipeline_and_emit_tracks(self, context_value: str, artist_name: str = None, artist_url: str = None):
+        """Pipelined flow: each track gets its phantom entry when it is queued for download
+        and is marked as complete when its download finishes, while fetching goes on."""
+        downloaded = await asyncio.to_thread(
+            run_pipeline,
+            artist_name,
+            artist_url,
+            on_queued=lambda track: self._emit_add_signal.emit(track, True, True),
+            on_downloaded=lambda track: self._emit_add_signal.emit(track, False, False)
+        )
+
+        QTimer.singleShot(
+            0,
+            partial(
+                QMessageBox.information,
+                self,
+                "Download complete",
+                f"Downloaded {len(downloaded)} missing tracks for artist: {context_value}"
+            )
+        )
 
     async def _download_from_artist(self, artist_name: str):
         """Download all missing tracks for an artist name."""
+        if pipeline_enabled():
+            await self._pipeline_and_emit_tracks(artist_name, artist_name=artist_name)
+            return
         missing_library = await asyncio.to_thread(get_artist_library, artist_name)
         await self._download_and_emit_tracks(missing_library, artist_name)
 
@@ -181,5 +216,8 @@ class DownloadWindow(QMainWindow):
 
     async def _download_from_url(self, url: str):
         """Download all missing tracks for a URL."""
+        if pipeline_enabled():
+            await self._pipeline_and_emit_tracks(url, artist_url=url)
+            return
         missing_library = await asyncio.to_thread(get_artist_library, None, url)
         await self._download_and_emit_tracks(missing_library, url)
@@ -2,8 +2,11 @@ import os
 import time
 import json
 import re
+import threading
 from pathlib import Path
 from utils.config import get_config, save_config
+from utils.dir_cache import scan_directory
+from utils.library import start_local_library, get_local_library
 from gui.download_window import DownloadWindow
 
 # Try PyQt5 first, fall back to PySide6
@@ -74,6 +77,9 @@ class MainWindow(QMainWindow):
         self.status = self.statusBar()
         self.status.showMessage("Ready")
 
+        # Live local library index (watched in the background, used by lookups and refreshes)
+        self._start_library()
+
         # Initial load
         self.reload_files(expand_all=True)
 
@@ -189,6 +195,13 @@ class MainWindow(QMainWindow):
                 save_config(self.config)
             except Exception:
                 pass
+            self._start_library()
+
+    def _start_library(self):
+        """(Re)start the shared LocalLibrary in a background thread so a cold scan doesn't block the UI."""
+        if not self.config.get('library_scan', {}).get('watch', True):
+            return
+        threading.Thread(target=start_local_library, daemon=True).start()
 
     def reload_files(self, path: str=None, expand_all: bool=False):
         """
@@ -330,20 +343,27 @@ class MainWindow(QMainWindow):
         if not base_dir.exists():
             return []
 
-        for root, dirs, files in os.walk(base_dir):
-            for fname in files:
-                path = Path(root) / fname
-                try:
-                    rel = str(path.relative_to(base_dir))
-                except Exception:
-                    rel = str(path)
-                yield {
-                    'relative': rel,
-                    'filename': str(path).rpartition("\\")[-1],
-                    'size': self._human_size(path.stat().st_size),
-                    'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(path.stat().st_mtime)),
-                    'path': str(path),
-                }
+        # prefer the live library index; otherwise unchanged folders are served
+        # from the directory cache instead of being re-listed
+        library = get_local_library()
+        if library is not None and library.covers(str(base_dir)):
+            entries = library.files(str(base_dir))
+        else:
+            entries = scan_directory(str(base_dir))
+
+        for fpath, fname, size, mtime_ns in entries:
+            path = Path(fpath)
+            try:
+                rel = str(path.relative_to(base_dir))
+            except Exception:
+                rel = str(path)
+            yield {
+                'relative': rel,
+                'filename': str(path).rpartition("\\")[-1],
+                'size': self._human_size(size),
+                'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime_ns / 1e9)),
+                'path': str(path),
+            }
 
     def _human_size(self, n):
         for unit in ['B','KB','MB','GB','TB']:
@@ -1,23 +1,65 @@
-from utils import download_song
+from utils import DownloadExecutor, init_download_directories
 from utils.search.get_artist_library import get_artist_library
+from utils.pipeline import pipeline_enabled, run_pipeline
+from utils.journal import DownloadJournal
 
-# === CONFIG ===
-ARTIST_NAME = input("Enter artist name: ")
+def resume_downloads(journal: DownloadJournal, artist_name: str):
+    """Download the jobs an earlier run left unfinished for this artist, straight from
+    the journal (no fetching, no library scan). Failed jobs still waiting out their
+    backoff are left for a later run."""
+    pending = journal.pending(artist_name)
+    ready = [track for track, delay in pending if delay == 0]
+    if len(ready) < len(pending):
+        print(f"{len(pending) - len(ready)} failed downloads for {artist_name} are waiting to be retried")
+    if not ready:
+        return
+    print(f"Resuming {len(ready)} unfinished downloads for {artist_name} from the journal")
+
+    with DownloadExecutor(journal=journal) as executor:
+        for track, future in zip(ready, executor.submit_all(ready)):
+            if future.exception() is not None:
+                # recorded as failed in the journal, the normal flow below still runs
+                print(f"Error downloading '{track.get('title')}': {future.exception()}")
 
 if __name__ == "__main__":
-    print(f"Fetching data for {ARTIST_NAME}...")
+    # === CONFIG ===
+    # asked here, not at import time: spawned worker processes re-import this module
+    ARTIST_NAME = input("Enter artist name: ")
+
+    init_download_directories()
+    journal = DownloadJournal()
 
-    missing = get_artist_library(ARTIST_NAME, include_featuring_tracks=True, include_full_album_if_featured=True, include_only_missing=True)
+    # finish what an interrupted run left behind, then look for anything else that's missing
+    resume_downloads(journal, ARTIST_NAME)
+
+    print(f"Fetching data for {ARTIST_NAME}...")
+    if pipeline_enabled():
+        # downloads start as soon as the first missing tracks are confirmed
+        run_pipeline(
+            ARTIST_NAME,
+            include_featuring_tracks=True,
+            include_full_album_if_featured=True,
+            on_queued=lambda t: print(f"  - {t}"),
+            journal=journal
+        )
+    else:
+        missing = get_artist_library(ARTIST_NAME, include_featuring_tracks=True, include_full_album_if_featured=True, include_only_missing=True)
+        # skip tracks already downloaded (but not showing in the library yet), in flight,
+        # or that failed and are waiting out their retry backoff
+        missing = [t for t in missing if journal.should_download(t)]
     
-    print(f"Missing {len(missing)} songs locally:")
-    for t in missing:
-        dur = t.get("duration_ms", 0)
-        dur_s = f"{int(dur/1000)}s" if dur else "unknown"
-        pid = t.get("provider_id") or "unknown"
-        print(t) # debug
-        # print(f"  - '{t['title']}' ({t['album']}) [{t['source']}] id={pid} dur={dur_s}")
-        # print(f"  - '{t['title']}'/'{t['normalized_title']}' ({t['album']}) [{t['source']}] id={pid} dur={dur_s}")
-        print(f"  - {t}")
+        print(f"Missing {len(missing)} songs locally:")
+        for t in missing:
+            dur = t.get("duration_ms", 0)
+            dur_s = f"{int(dur/1000)}s" if dur else "unknown"
+            pid = t.get("provider_id") or "unknown"
+            print(t) # debug
+            # print(f"  - '{t['title']}' ({t['album']}) [{t['source']}] id={pid} dur={dur_s}")
+            # print(f"  - '{t['title']}'/'{t['normalized_title']}' ({t['album']}) [{t['source']}] id={pid} dur={dur_s}")
+            print(f"  - {t}")
         
-    for t in missing:
-        download_song(t)
+        journal.plan(missing, ARTIST_NAME)
+        with DownloadExecutor(journal=journal) as executor:
+            futures = executor.submit_all(missing)
+            for future in futures:
+                future.result()  # surface download errors
@@ -0,0 +1,33 @@
+import os
+import json
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# utils.search.fetch_spotify builds its client at import time and needs credentials for that
+os.environ.setdefault("SPOTIPY_CLIENT_ID", "test")
+os.environ.setdefault("SPOTIPY_CLIENT_SECRET", "test")
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Run the test from tmp_path with a copy of the repo's config.json, so the cache,
+    temp and output directories (all relative) end up there. Returns a function that
+    updates config sections and rewrites the file."""
+    with open(os.path.join(ROOT, "config.json"), "r") as f:
+        data = json.load(f)
+    data["music_directory"] = str(tmp_path / "music")
+    monkeypatch.chdir(tmp_path)
+
+    def update(**sections):
+        for key, value in sections.items():
+            if isinstance(value, dict):
+                data.setdefault(key, {}).update(value)
+            else:
+                data[key] = value
+        with open("config.json", "w") as f:
+            json.dump(data, f, indent=4)
+        return data
+
+    update()
+    return update
@@ -0,0 +1,41 @@
+import random
+import string
+import pytest
+from utils.compare import title_similarity, title_similarity_at_least
+
+TITLES = [
+    "Song", "Song (Remix)", "Song - Live", "Song (feat. Someone)", "Song [Radio Edit]", "Songs",
+    "Another Song", "Night", "Nights", "Night Drive", "Intro", "Outro", "Interlude",
+    "Ballad of the Night", "Midnight City", "Midnight City (Extended Mix)", "A", "", "Ünïcödé Tïtle",
+]
+THRESHOLDS = [0.0, 0.3, 0.5, 0.6, 0.75, 0.8, 0.9, 1.0]
+
+
+def mutate(rng, title):
+    """Typos, dropped words and added suffixes, to get pairs all across the similarity range."""
+    chars = list(title)
+    for _ in range(rng.randrange(4)):
+        op = rng.randrange(3)
+        i = rng.randrange(len(chars) + 1)
+        if op == 0:
+            chars.insert(i, rng.choice(string.ascii_letters + " ()-"))
+        elif chars and op == 1:
+            del chars[min(i, len(chars) - 1)]
+        elif chars:
+            chars[min(i, len(chars) - 1)] = rng.choice(string.ascii_lowercase)
+    return "".join(chars) + rng.choice(["", "", " (Remix)", " - Live", " feat. X"])
+
+def track(rng, title):
+    return {"title": title, "source": rng.choice([None, "Spotify", "Deezer", "SoundCloud", "Local"])}
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_bounded_check_makes_the_same_decision_as_the_score(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        a = rng.choice(TITLES)
+        b = mutate(rng, rng.choice([a, rng.choice(TITLES)]))
+        pair = (track(rng, a), track(rng, b)) if rng.random() < 0.8 else (a, b)
+        score = title_similarity(*pair)
+        for threshold in THRESHOLDS + [round(score, 6), score]:
+            assert title_similarity_at_least(*pair, threshold=threshold) == (score >= threshold), (pair, threshold)
@@ -0,0 +1,49 @@
+import os
+from utils.dir_cache import scan_directory
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def rewrite_in_place(path, content):
+    """Rewrite a file without touching its directory's mtime."""
+    directory = os.path.dirname(path)
+    directory_mtime = os.stat(directory).st_mtime_ns
+    write(path, content)
+    bump_mtime(path)
+    os.utime(directory, ns=(directory_mtime, directory_mtime))
+
+
+def test_incremental_scan_relists_changed_directories_only(config):
+    write("music/a/1.mp3", "1")
+    write("music/b/2.mp3", "2")
+    assert sorted(e[1] for e in scan_directory("music", incremental=True)) == ["1.mp3", "2.mp3"]
+
+    write("music/b/3.mp3", "3")
+    bump_mtime("music/b")
+    assert sorted(e[1] for e in scan_directory("music", incremental=True)) == ["1.mp3", "2.mp3", "3.mp3"]
+
+    os.remove("music/a/1.mp3")
+    bump_mtime("music/a")
+    assert sorted(e[1] for e in scan_directory("music", incremental=True)) == ["2.mp3", "3.mp3"]
+
+def test_incremental_scan_trusts_directory_mtimes(config):
+    write("music/a/1.mp3", "1")
+    [(_, _, size, _)] = scan_directory("music", incremental=True)
+    rewrite_in_place("music/a/1.mp3", "new tags")
+
+    # documented caveat: the reused listing still has the old size
+    assert [e[2] for e in scan_directory("music", incremental=True)] == [size]
+    assert [e[2] for e in scan_directory("music", incremental=False)] == [os.path.getsize("music/a/1.mp3")]
+
+def test_full_scan_is_the_default(config):
+    write("music/a/1.mp3", "1")
+    scan_directory("music", incremental=True)
+    rewrite_in_place("music/a/1.mp3", "new tags")
+    assert [e[2] for e in scan_directory("music")] == [os.path.getsize("music/a/1.mp3")]
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("SpotiFLAC")  # utils.download needs the SpotiFLAC backend importable
+
+from utils import download
+from utils.download import group_by_album, download_album
+
+
+def track(n, album_url="https://www.deezer.com/album/1", album_track_count=4, **extra):
+    return {"source": "Deezer", "provider_id": n, "title": f"Track {n}", "url": f"https://www.deezer.com/track/{n}",
+            "album": "Album", "album_url": album_url, "album_track_count": album_track_count, **extra}
+
+
+def test_mostly_missing_albums_are_batched(config):
+    config(download={"album_batch": True, "album_batch_ratio": 0.75})
+    tracks = [track(1), track(2), track(3), track(10, album_url="https://www.deezer.com/album/2")]
+    albums, singles = group_by_album(tracks)
+    assert albums == [tracks[:3]]
+    assert singles == [tracks[3]]
+
+def test_albums_below_the_ratio_are_downloaded_track_by_track(config):
+    config(download={"album_batch": True, "album_batch_ratio": 0.75})
+    tracks = [track(1, album_track_count=10), track(2, album_track_count=10)]
+    assert group_by_album(tracks) == ([], tracks)
+
+def test_batches_need_two_tracks_a_url_and_a_known_album_size(config):
+    config(download={"album_batch": True, "album_batch_ratio": 0.5})
+    single = [track(1, album_track_count=1)]
+    assert group_by_album(single) == ([], single)
+    unknown_size = [track(1, album_track_count=None), track(2, album_track_count=None)]
+    assert group_by_album(unknown_size) == ([], unknown_size)
+    no_url = [track(1, url=None), track(2, url=None)]
+    assert group_by_album(no_url) == ([], no_url)
+
+def test_sources_are_never_batched_together(config):
+    config(download={"album_batch": True, "album_batch_ratio": 0.5})
+    tracks = [track(1), track(2, source="SoundCloud")]
+    assert group_by_album(tracks) == ([], tracks)
+
+def test_album_batching_can_be_disabled(config):
+    config(download={"album_batch": False})
+    tracks = [track(1), track(2), track(3), track(4)]
+    assert group_by_album(tracks) == ([], tracks)
+
+
+def test_failed_album_download_falls_back_to_single_tracks(config, monkeypatch):
+    def failing_album_download(url, job_dir, filename_format):
+        raise RuntimeError("album not available")
+
+    downloaded = []
+    monkeypatch.setattr(download, "_run_spotiflac", failing_album_download)
+    monkeypatch.setattr(download, "download_song", lambda t: downloaded.append(t) or [f"{t['title']}.flac"])
+    tracks = [track(1), track(2)]
+    assert download_album(tracks) == [["Track 1.flac"], ["Track 2.flac"]]
+    assert downloaded == tracks
@@ -0,0 +1,62 @@
+import pytest
+from utils.search import fetch_deezer
+
+ARTIST = 1
+
+def listing_track(track_id, artist_id):
+    return {"id": track_id, "title": f"Track {track_id}", "artist": {"id": artist_id, "name": f"Artist {artist_id}"},
+            "duration": 200, "link": f"https://www.deezer.com/track/{track_id}"}
+
+API = {
+    f"https://api.deezer.com/artist/{ARTIST}/top?limit=100": {
+        "data": [{"id": 100, "album": {"id": 10, "title": "Album"}, "artist": {"id": ARTIST}}],
+    },
+    "https://api.deezer.com/album/10/tracks?limit=100": {
+        "data": [listing_track(100, ARTIST), listing_track(101, 2), listing_track(102, 2)],
+    },
+    # 101 features the artist, 102 doesn't
+    "https://api.deezer.com/track/101": {"contributors": [{"id": 2}, {"id": ARTIST}]},
+    "https://api.deezer.com/track/102": {"contributors": [{"id": 2}]},
+}
+
+
+@pytest.fixture
+def requested(config, monkeypatch):
+    requested = []
+
+    def deezer_get(url, max_retries=5):
+        requested.append(url)
+        return API[url]
+
+    monkeypatch.setattr(fetch_deezer, "_deezer_get", deezer_get)
+    return requested
+
+def track_details(requested):
+    return sorted(url for url in requested if "/track/" in url)
+
+
+def test_main_artist_tracks_only(requested):
+    tracks = fetch_deezer.get_deezer_discography(ARTIST, include_feats=False)
+    assert [t["provider_id"] for t in tracks] == ["100"]
+    assert track_details(requested) == []
+
+def test_featuring_tracks_need_contributors(requested):
+    tracks = fetch_deezer.get_deezer_discography(ARTIST, include_feats=True, include_full_album_if_featured=False)
+    assert [t["provider_id"] for t in tracks] == ["100", "101"]
+    # only tracks by another main artist are looked up
+    assert track_details(requested) == ["https://api.deezer.com/track/101", "https://api.deezer.com/track/102"]
+
+def test_full_albums_need_no_contributors(requested):
+    tracks = fetch_deezer.get_deezer_discography(ARTIST, include_feats=True, include_full_album_if_featured=True)
+    assert [t["provider_id"] for t in tracks] == ["100", "101", "102"]
+    assert track_details(requested) == []
+
+def test_contributors_are_cached_but_errors_are_not(requested, monkeypatch):
+    monkeypatch.setitem(API, "https://api.deezer.com/track/102", {"error": {"code": 800}})
+    fetch_deezer.get_deezer_discography(ARTIST, include_feats=True)
+    requested.clear()
+
+    monkeypatch.setitem(API, "https://api.deezer.com/track/102", {"contributors": [{"id": 2}]})
+    tracks = fetch_deezer.get_deezer_discography(ARTIST, include_feats=True)
+    assert [t["provider_id"] for t in tracks] == ["100", "101"]
+    assert track_details(requested) == ["https://api.deezer.com/track/102"]
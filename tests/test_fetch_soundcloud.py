@@ -0,0 +1,78 @@
+import random
+import pytest
+from utils.search import fetch_soundcloud
+
+USER = 7
+
+
+class Response:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def old_album_titles(tracks, playlists):
+    """Album assignment as it was before the map: every track against every playlist's tracks."""
+    albums = {}
+    for track in tracks:
+        albums[track["id"]] = track["title"]
+        for playlist in playlists:
+            for playlisttrack in playlist.get("tracks", []):
+                if playlisttrack.get("id") == track["id"]:
+                    if playlist.get("title"):
+                        albums[track["id"]] = playlist["title"]
+                    break
+    return albums
+
+def random_account(rng):
+    tracks = [{"id": i, "title": f"Track {i}", "duration": 200_000, "permalink_url": f"https://soundcloud.com/u/{i}"}
+              for i in range(rng.randrange(1, 20))]
+    playlists = [
+        {"id": 100 + p, "title": rng.choice([None, "", f"Playlist {p}"]), "permalink_url": f"https://soundcloud.com/u/sets/{p}",
+         "tracks": [{"id": rng.randrange(25)} for _ in range(rng.randrange(6))]}
+        for p in range(rng.randrange(6))
+    ]
+    return tracks, playlists
+
+@pytest.fixture
+def account(config, monkeypatch):
+    """Serve a fake SoundCloud account; returns a function that installs (tracks, playlists)."""
+    def install(tracks, playlists):
+        def request(method, url, client_id, client_secret, **kwargs):
+            if url == "https://api.soundcloud.com/resolve":
+                return Response({"id": USER})
+            if url == f"https://api.soundcloud.com/users/{USER}/playlists":
+                show_tracks = kwargs["params"]["show_tracks"]
+                return Response({"collection": [
+                    p if show_tracks else {k: v for k, v in p.items() if k != "tracks"} for p in playlists
+                ]})
+            if url == f"https://api.soundcloud.com/users/{USER}/tracks":
+                return Response({"collection": tracks})
+            playlist_id = int(url.split("/playlists/")[1].split("/")[0])
+            return Response({"collection": next(p["tracks"] for p in playlists if p["id"] == playlist_id)})
+
+        monkeypatch.setattr(fetch_soundcloud, "_request_with_retry", request)
+    return install
+
+
+@pytest.mark.parametrize("show_tracks", [True, False])
+@pytest.mark.parametrize("seed", range(50))
+def test_album_titles_match_the_old_assignment(config, account, seed, show_tracks):
+    config(soundcloud={"playlist_show_tracks": show_tracks})
+    tracks, playlists = random_account(random.Random(seed))
+    account(tracks, playlists)
+
+    fetched = fetch_soundcloud.get_soundcloud_discography("someone")
+    expected = old_album_titles(tracks, playlists)
+    assert {int(t["provider_id"]): t["album"] for t in fetched} == expected
+
+def test_album_url_and_size_come_from_the_playlist(config, account):
+    config(soundcloud={"playlist_show_tracks": True})
+    tracks = [{"id": 1, "title": "One"}, {"id": 2, "title": "Two"}]
+    account(tracks, [{"id": 100, "title": "EP", "permalink_url": "https://soundcloud.com/u/sets/ep",
+                      "tracks": [{"id": 1}, {"id": 3}]}])
+    one, two = fetch_soundcloud.get_soundcloud_discography("someone")
+    assert (one["album"], one["album_url"], one["album_track_count"]) == ("EP", "https://soundcloud.com/u/sets/ep", 2)
+    assert (two["album"], two["album_url"], two["album_track_count"]) == ("Two", None, None)
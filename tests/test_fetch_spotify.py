@@ -0,0 +1,38 @@
+import time
+import threading
+from utils.search import fetch_spotify
+from utils.search.fetch_spotify import SharedClientCredentials, TokenStoreCacheHandler
+
+
+def credentials(requests):
+    """A fresh client (like one in another process): nothing in memory, same token store."""
+    auth = SharedClientCredentials(client_id="id", client_secret="secret", cache_handler=TokenStoreCacheHandler("id"))
+
+    def request_access_token():
+        requests.append(threading.current_thread().name)
+        time.sleep(0.2)  # long enough for the other clients to find no token on disk yet
+        return {"access_token": f"token-{len(requests)}", "expires_in": 3600, "token_type": "Bearer"}
+
+    auth._request_access_token = request_access_token
+    return auth
+
+
+def test_concurrent_clients_share_one_token(config):
+    requests = []
+    clients = [credentials(requests) for _ in range(4)]
+    tokens = []
+    threads = [threading.Thread(target=lambda c=c: tokens.append(c.get_access_token(as_dict=False))) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(requests) == 1
+    assert tokens == ["token-1"] * 4
+
+def test_expired_tokens_are_requested_again(config, monkeypatch):
+    requests = []
+    assert credentials(requests).get_access_token(as_dict=False) == "token-1"
+    now = time.time()
+    monkeypatch.setattr(fetch_spotify.time, "time", lambda: now + 7200)
+    assert credentials(requests).get_access_token(as_dict=False) == "token-2"
@@ -0,0 +1,33 @@
+import random
+import pytest
+from utils import local_tracks
+from utils.compare import is_match
+
+TITLES = ["Song", "Song (Remix)", "Song - Live", "Another Song", "Night", "Nights", "Intro", "Outro", "Night Drive"]
+DURATIONS = [None, 0, 120_000, 175_000, 180_000, 184_999, 185_000, 190_001, 240_000]
+
+
+def brute_force_missing(tracks, library):
+    """get_missing as it was before indexing: every remote track against every local one."""
+    return [t for t in tracks if not any(is_match(lt, t) for lt in library)]
+
+def random_duration(rng):
+    duration = rng.choice(DURATIONS)
+    return duration + rng.randrange(-3000, 3000) if duration else duration
+
+def random_tracks(rng, source, count):
+    return [
+        {"source": source, "provider_id": i, "title": rng.choice(TITLES), "duration_ms": random_duration(rng)}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_indexed_lookup_matches_the_brute_force_scan(config, monkeypatch, seed):
+    config(matching={"isrc": False, "title_candidates": 0})
+    rng = random.Random(seed)
+    library = random_tracks(rng, "Local", rng.randrange(0, 30))
+    remote = random_tracks(rng, rng.choice(["Spotify", "Deezer", "SoundCloud"]), rng.randrange(0, 30))
+    monkeypatch.setattr(local_tracks, "get_local_tracks", lambda directory: library)
+
+    assert local_tracks.get_missing(remote, "music") == brute_force_missing(remote, library)
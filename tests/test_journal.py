@@ -0,0 +1,104 @@
+import os
+import json
+import pytest
+from utils import journal as journal_module
+from utils.journal import DownloadJournal, DONE, FAILED, IN_PROGRESS
+
+
+def track(provider_id, **extra):
+    return {"source": "Deezer", "provider_id": provider_id, "title": f"Track {provider_id}",
+            "url": f"https://example.com/{provider_id}", **extra}
+
+def downloaded(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"audio")
+    return [path]
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(journal_module.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def journal(config, clock, tmp_path):
+    config(journal={"retry_backoff": 30, "max_attempts": 3})
+    return DownloadJournal(str(tmp_path / "downloads.jsonl"))
+
+
+def test_planned_jobs_are_pending_for_their_artist(journal):
+    journal.plan([track(1), track(2)], "Artist")
+    assert [(t["provider_id"], delay) for t, delay in journal.pending("artist")] == [(1, 0.0), (2, 0.0)]
+    assert journal.pending("someone else") == []
+    assert journal.should_download(track(1))
+
+def test_done_and_in_flight_jobs_are_skipped(journal):
+    journal.plan([track(1), track(2)], "Artist")
+    journal.start(track(1))
+    journal.finish(track(1), downloaded("out/1.flac"))
+    journal.start(track(2))
+    assert journal.state(track(1)) == DONE
+    assert journal.state(track(2)) == IN_PROGRESS
+    assert not journal.should_download(track(1))
+    assert not journal.should_download(track(2))
+    # an interrupted job is picked up by the next run
+    assert [t["provider_id"] for t, _ in journal.pending("Artist")] == [2]
+
+def test_failed_jobs_back_off_exponentially(journal, clock):
+    journal.plan([track(1)], "Artist")
+    journal.finish(track(1), error="boom")
+    assert journal.state(track(1)) == FAILED
+    assert not journal.should_download(track(1))
+    assert journal.pending("Artist")[0][1] == 30
+
+    clock[0] += 30
+    assert journal.should_download(track(1))
+    journal.finish(track(1), error="boom again")
+    assert journal.pending("Artist")[0][1] == 60
+
+    clock[0] += 60
+    journal.finish(track(1), error="third time")
+    # max_attempts reached: never retried
+    assert journal.pending("Artist") == []
+    clock[0] += 3600
+    assert not journal.should_download(track(1))
+
+def test_permanent_failures_are_not_retried(journal, clock):
+    journal.plan([track(1)], "Artist")
+    journal.finish(track(1), error="no url", permanent=True)
+    clock[0] += 3600
+    assert journal.pending("Artist") == []
+    assert not journal.should_download(track(1))
+
+def test_replay_restores_state_and_survives_a_torn_line(journal, tmp_path):
+    journal.plan([track(1), track(2)], "Artist")
+    journal.finish(track(1), downloaded("out/1.flac"))
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"key": "deezer:2", "state": DONE})[:20])  # crash mid-write
+
+    replayed = DownloadJournal(journal.path)
+    assert replayed.is_done(track(1))
+    assert [t["provider_id"] for t, _ in replayed.pending("Artist")] == [2]
+
+    replayed.finish(track(2), downloaded("out/2.flac"))
+    assert DownloadJournal(journal.path).is_done(track(2))
+
+def test_tracks_without_provider_id_are_not_journaled(journal):
+    journal.plan([{"source": "Deezer", "title": "No id"}], "Artist")
+    assert journal.jobs == {}
+    assert journal.should_download({"source": "Deezer", "title": "No id"})
+
+def test_deleted_downloads_are_fetched_again(journal):
+    journal.plan([track(1)], "Artist")
+    journal.finish(track(1), error="boom")
+    journal.finish(track(1), downloaded("out/1.flac"))
+    assert not DownloadJournal(journal.path).should_download(track(1))
+
+    os.remove("out/1.flac")
+    replayed = DownloadJournal(journal.path)
+    assert not replayed.is_done(track(1))
+    assert replayed.should_download(track(1))
+    replayed.plan([track(1)], "Artist")
+    assert replayed.jobs["deezer:1"]["attempts"] == 0
+    assert [t["provider_id"] for t, _ in replayed.pending("Artist")] == [1]
@@ -0,0 +1,39 @@
+import os
+from utils import dir_cache, local_tracks
+from utils.dir_cache import scan_directory
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_scan_reports_skipped_directories(config, monkeypatch):
+    write("music/good/a.mp3", "a")
+    write("music/bad/b.mp3", "b")
+    list_directory = dir_cache._list_directory
+
+    def failing(directory):
+        if os.path.basename(directory) == "bad":
+            raise PermissionError(13, "Permission denied", directory)
+        return list_directory(directory)
+
+    monkeypatch.setattr(dir_cache, "_list_directory", failing)
+    skipped = []
+    entries = scan_directory("music", incremental=False, skipped=skipped)
+    assert [e[1] for e in entries] == ["a.mp3"]
+    assert skipped == [os.path.join("music", "bad")]
+
+def test_get_local_tracks_keeps_ledger_after_partial_scan(config, monkeypatch):
+    write("music/a.mp3", "a")
+    pruned = []
+    monkeypatch.setattr(local_tracks, "read_tracks", lambda batch: [None] * len(batch))
+    monkeypatch.setattr(local_tracks, "prune_ledger", lambda root, paths: pruned.append(root))
+
+    skipped = ["music/unreadable"]
+    local_tracks.get_local_tracks("music", listing=scan_directory("music"), skipped=skipped)
+    assert pruned == []
+
+    local_tracks.get_local_tracks("music")
+    assert pruned == ["music"]
@@ -0,0 +1,85 @@
+import copy
+import random
+import pytest
+from utils.compare import is_match
+from utils.search.get_artist_library import IncrementalMerger, merge_and_deduplicate
+
+TITLES = ["Song", "Song (Remix)", "Song - Live", "Another Song", "Night", "Nights", "Intro", "Outro", "Night Drive"]
+SOURCES = {"spotify": "Spotify", "deezer": "Deezer", "soundcloud": "SoundCloud"}
+
+
+def quadratic_merge(spotify_tracks, deezer_tracks, soundcloud_tracks, priority_order):
+    """merge_and_deduplicate as it was before indexing: every track against every merged one."""
+    merged = []
+    source_map = {"spotify": spotify_tracks, "deezer": deezer_tracks, "soundcloud": soundcloud_tracks}
+    for source in priority_order:
+        for t in source_map.get(source.lower(), []):
+            t["source"] = t.get("source") or source.capitalize()
+            if t["source"].lower() != priority_order[0] and any(
+                    e.get("source") != t["source"] and is_match(e, t) for e in merged):
+                continue
+            merged.append(t)
+    return merged
+
+def random_tracks(rng, source, count, ids=10):
+    # few titles, durations and provider IDs, so duplicates within and across sources are common
+    return [
+        {
+            "source": SOURCES[source],
+            "provider_id": rng.randrange(ids),
+            "title": rng.choice(TITLES),
+            "duration_ms": rng.choice([None, 180_000, 181_500, 184_000, 240_000]),
+        }
+        for _ in range(count)
+    ]
+
+def random_library(rng):
+    return {source: random_tracks(rng, source, rng.randrange(0, 15)) for source in SOURCES}
+
+def summary(tracks):
+    return [(t["source"], t["provider_id"], t["title"], t["duration_ms"]) for t in tracks]
+
+@pytest.fixture
+def exhaustive(config):
+    # the old merge neither joined on ISRC nor narrowed candidates by title
+    return config(matching={"isrc": False, "title_candidates": 0})
+
+
+@pytest.mark.parametrize("seed", range(150))
+def test_merge_matches_the_quadratic_merge(exhaustive, seed):
+    rng = random.Random(seed)
+    library = random_library(rng)
+    expected = quadratic_merge(*copy.deepcopy([library["spotify"], library["deezer"], library["soundcloud"]]),
+                               exhaustive["platform_priority_order"])
+    actual = merge_and_deduplicate(library["spotify"], library["deezer"], library["soundcloud"])
+    assert summary(actual) == summary(expected)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_incremental_merger_matches_the_batch_merge_in_any_arrival_order(config, seed):
+    rng = random.Random(seed)
+    library = random_library(rng)
+    expected = merge_and_deduplicate(*copy.deepcopy([library["spotify"], library["deezer"], library["soundcloud"]]))
+
+    # every source streams its tracks in random batches, interleaved at random
+    events = []
+    for source, tracks in library.items():
+        cuts = sorted(rng.sample(range(1, len(tracks)), rng.randrange(len(tracks)))) if len(tracks) > 1 else []
+        batches = [tracks[i:j] for i, j in zip([0] + cuts, cuts + [len(tracks)])]
+        events.append([(source, batch) for batch in batches] + [(source, None)])
+    merger = IncrementalMerger()
+    streamed = []
+    while events:
+        stream = rng.choice(events)
+        source, batch = stream.pop(0)
+        if batch is None:
+            merger.finish(source)
+        else:
+            merger.add(source, batch)
+        if not stream:
+            events.remove(stream)
+        streamed.extend(merger.take())
+
+    assert merger.done
+    assert summary(streamed) == summary(expected)
+    assert summary(merger.result()) == summary(expected)
@@ -0,0 +1,69 @@
+import os
+import errno
+import shutil
+import pytest
+from utils import staging
+from utils.staging import finalize
+
+
+@pytest.fixture
+def files(tmp_path):
+    staged = tmp_path / "staging" / "job" / "download.flac"
+    staged.parent.mkdir(parents=True)
+    staged.write_bytes(b"audio")
+    final = tmp_path / "output" / "Artist" / "01. Title.flac"
+    final.parent.mkdir(parents=True)
+    return str(staged), str(final)
+
+@pytest.fixture
+def cross_device(monkeypatch):
+    """Make renames out of the staging directory fail like they do across filesystems."""
+    replace = os.replace
+
+    def fake_replace(src, dst):
+        if os.sep + "staging" + os.sep in str(src):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        return replace(src, dst)
+
+    monkeypatch.setattr(staging.os, "replace", fake_replace)
+
+
+def test_finalize_renames_on_the_same_filesystem(files):
+    staged, final = files
+    finalize(staged, final)
+    assert not os.path.exists(staged)
+    with open(final, "rb") as f:
+        assert f.read() == b"audio"
+
+def test_finalize_copies_across_filesystems(files, cross_device):
+    staged, final = files
+    finalize(staged, final)
+    assert not os.path.exists(staged)
+    with open(final, "rb") as f:
+        assert f.read() == b"audio"
+    assert os.listdir(os.path.dirname(final)) == [os.path.basename(final)]
+
+def test_failed_copy_leaves_no_partial_file(files, cross_device, monkeypatch):
+    staged, final = files
+
+    def failing_copy(src, dst):
+        with open(dst, "wb") as f:
+            f.write(b"aud")
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(shutil, "copy2", failing_copy)
+    with pytest.raises(OSError):
+        finalize(staged, final)
+    assert os.path.exists(staged)
+    assert os.listdir(os.path.dirname(final)) == []
+
+def test_other_errors_are_raised(files, monkeypatch):
+    staged, final = files
+
+    def denied(src, dst):
+        raise PermissionError(errno.EACCES, os.strerror(errno.EACCES))
+
+    monkeypatch.setattr(staging.os, "replace", denied)
+    with pytest.raises(PermissionError):
+        finalize(staged, final)
+    assert os.path.exists(staged)
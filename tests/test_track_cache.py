@@ -0,0 +1,82 @@
+import os
+from utils import local_tracks
+from utils.track_cache import TrackCache, CACHE_VERSION
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_track_cache_hit_and_invalidation(config):
+    with TrackCache("music") as cache:
+        cache.put("music/a.mp3", 10, 100, {"title": "a"})
+        cache.mark_seen("music/a.mp3")
+
+    with TrackCache("music") as cache:
+        assert cache.get("music/a.mp3", 10, 100) == {"title": "a"}
+        assert cache.get("music/a.mp3", 11, 100) is None  # size changed
+        assert cache.get("music/a.mp3", 10, 101) is None  # mtime changed
+        assert (cache.hits, cache.misses) == (1, 2)
+        cache.mark_seen("music/a.mp3")
+
+def test_track_cache_ignores_rows_of_older_versions(config):
+    with TrackCache("music") as cache:
+        cache.put("music/a.mp3", 10, 100, {"title": "a"})
+        cache.mark_seen("music/a.mp3")
+    with TrackCache("music") as cache:
+        with cache.conn:
+            cache.conn.execute("UPDATE tracks SET version = ?", (CACHE_VERSION - 1,))
+        cache.mark_seen("music/a.mp3")
+
+    with TrackCache("music") as cache:
+        assert cache.get("music/a.mp3", 10, 100) is None
+
+def test_track_cache_evicts_unseen_files_only_after_a_complete_scan(config):
+    with TrackCache("music") as cache:
+        cache.put("music/a.mp3", 10, 100, {"title": "a"})
+        cache.put("music/b.mp3", 10, 100, {"title": "b"})
+        cache.mark_seen("music/a.mp3")
+        cache.mark_seen("music/b.mp3")
+
+    try:
+        with TrackCache("music") as cache:
+            cache.mark_seen("music/a.mp3")
+            raise RuntimeError("scan interrupted")
+    except RuntimeError:
+        pass
+    with TrackCache("music") as cache:
+        assert cache.get("music/b.mp3", 10, 100) == {"title": "b"}
+        cache.mark_seen("music/a.mp3")
+
+    with TrackCache("music") as cache:
+        assert cache.get("music/a.mp3", 10, 100) is not None
+        assert cache.get("music/b.mp3", 10, 100) is None
+
+
+def test_get_local_tracks_reparses_changed_files_only(config, monkeypatch):
+    write("music/a.mp3", "a")
+    write("music/b.mp3", "b")
+    parsed = []
+
+    def read_tracks(batch):
+        parsed.extend(fname for _, fname in batch)
+        return [{"path": path, "filename": fname, "title": fname} for path, fname in batch]
+
+    monkeypatch.setattr(local_tracks, "read_tracks", read_tracks)
+    assert len(local_tracks.get_local_tracks("music")) == 2
+    assert sorted(parsed) == ["a.mp3", "b.mp3"]
+
+    parsed.clear()
+    assert len(local_tracks.get_local_tracks("music")) == 2
+    assert parsed == []
+
+    write("music/a.mp3", "new tags")
+    bump_mtime("music/a.mp3")
+    assert len(local_tracks.get_local_tracks("music")) == 2
+    assert parsed == ["a.mp3"]
@@ -1,10 +1,30 @@
-from .config import config, get_config
-from .search.fetch_deezer import get_deezer_discography, get_deezer_artist_id
-from .search.fetch_spotify import get_spotify_discography, get_spotify_artist_id
-from .search.fetch_soundcloud import get_soundcloud_discography, get_soundcloud_artist_id, get_soundcloud_artist_permalink
-from .normalize import normalize_title_for_similarity
-from .local_tracks import get_local_tracks, get_missing
-from .compare import title_similarity, title_similar, duration_close, is_match
-from .placeholders import placeholders
-from .sanitize_path import sanitize_path
-from .download import download_song
+import importlib
+
+# Exports are imported on first access (PEP 562 module __getattr__), so importing one
+# submodule doesn't run the rest: library scan worker processes import utils.tag_reader,
+# and under spawn/forkserver that must not import SpotiFLAC, build the provider clients
+# or read config.json.
+_EXPORTS = {
+    ".config": ["get_config"],
+    ".search.fetch_deezer": ["get_deezer_discography", "iter_deezer_discography", "get_deezer_artist_id"],
+    ".search.fetch_spotify": ["get_spotify_discography", "iter_spotify_discography", "get_spotify_artist_id"],
+    ".search.fetch_soundcloud": ["get_soundcloud_discography", "iter_soundcloud_discography", "get_soundcloud_artist_id", "get_soundcloud_artist_permalink"],
+    ".normalize": ["normalize_title_for_similarity"],
+    ".local_tracks": ["get_local_tracks", "get_missing", "missing_checker"],
+    ".compare": ["title_similarity", "title_similarity_at_least", "title_similar", "duration_close", "is_match"],
+    ".placeholders": ["placeholders"],
+    ".sanitize_path": ["sanitize_path"],
+    ".download": ["download_song", "DownloadExecutor", "init_download_directories"],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,20 @@
+import os
+import sqlite3
+from .config import get_config
+
+
+def get_cache_directory() -> str:
+    """Return the directory used for persistent caches, creating it if needed.
+    Unlike temp_directory it is never cleared on startup."""
+    directory = get_config().get("cache_directory", "cache")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def open_cache_db(name: str) -> sqlite3.Connection:
+    """Open (or create) the SQLite database `<cache_directory>/<name>.sqlite3`.
+    WAL mode lets the GUI and a CLI run read/write the same cache concurrently."""
+    path = os.path.join(get_cache_directory(), f"{name}.sqlite3")
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -2,38 +2,25 @@ from difflib import SequenceMatcher
 from .normalize import normalize_title_for_similarity
 
 DEBUG_KEYWORDS = []
+DURATION_TOLERANCE_MS = 5000
 
-def title_similarity(a="", b=""):
-    # Safely extract title and source whether a/b are dicts or plain strings
-    if isinstance(a, dict):
-        a_title = a.get("title", "") or ""
-        a_source = a.get("source")
-    else:
-        a_title = str(a) or ""
-        a_source = None
-
-    if isinstance(b, dict):
-        b_title = b.get("title", "") or ""
-        b_source = b.get("source")
-    else:
-        b_title = str(b) or ""
-        b_source = None
-
-    # Normalized comparison (uses source-aware normalizer)
-    a_norm = normalize_title_for_similarity(a_title, a_source)
-    b_norm = normalize_title_for_similarity(b_title, b_source)
-    match_norm = SequenceMatcher(None, a_norm, b_norm).ratio()
-
-    # boost similarity when one normalized title is contained in the other
-    if a_norm in b_norm or b_norm in a_norm:
-        match_norm = min(1.0, match_norm + 0.30)
+# Slack added to the similarity upper bounds so float rounding in the blend below
+# can never make the bounded check reject a pair the exact score would accept
+_BOUND_EPSILON = 1e-9
 
-    # Raw lowercase comparison (no normalization)
-    a_raw = a_title.lower()
-    b_raw = b_title.lower()
-    match_raw = SequenceMatcher(None, a_raw, b_raw).ratio()
+def _title_and_source(x):
+    # Safely extract title and source whether x is a dict or a plain string
+    if isinstance(x, dict):
+        return x.get("title", "") or "", x.get("source")
+    return str(x) or "", None
 
+def _normalized_title(x, title, source):
+    # Tracks carry their normalized title (computed once when the track dict is built)
+    if isinstance(x, dict) and x.get("normalized_title") is not None:
+        return x["normalized_title"]
+    return normalize_title_for_similarity(title, source)
 
+def _combine(match_norm, match_raw, a_source, b_source):
     # If raw match is substantially higher than normalized, prefer raw
     if match_raw - match_norm > 0.12:
         result = match_raw
@@ -49,20 +36,79 @@ def title_similarity(a="", b=""):
         result = min(1.0, result + 0.05)
 
     # Clamp to [0, 1]
-    result = max(0.0, min(1.0, result))
+    return max(0.0, min(1.0, result))
 
+def _debug_report(a_title, b_title, result):
     # Handle debug keywords: if both title contains a debug keyword, require exact match
     a_debug = any(normalize_title_for_similarity(kw).lower() in a_title.lower() for kw in DEBUG_KEYWORDS)
     b_debug = any(normalize_title_for_similarity(kw).lower() in b_title.lower() for kw in DEBUG_KEYWORDS)
     if a_debug and b_debug:
         print(f"Debug titles detected: '{a_title}' | '{b_title}' -> {result}")
-        
+
+def title_similarity(a="", b=""):
+    a_title, a_source = _title_and_source(a)
+    b_title, b_source = _title_and_source(b)
+
+    # Normalized comparison (uses source-aware normalizer)
+    a_norm = _normalized_title(a, a_title, a_source)
+    b_norm = _normalized_title(b, b_title, b_source)
+    match_norm = SequenceMatcher(None, a_norm, b_norm).ratio()
+
+    # boost similarity when one normalized title is contained in the other
+    if a_norm in b_norm or b_norm in a_norm:
+        match_norm = min(1.0, match_norm + 0.30)
+
+    # Raw lowercase comparison (no normalization)
+    a_raw = a_title.lower()
+    b_raw = b_title.lower()
+    match_raw = SequenceMatcher(None, a_raw, b_raw).ratio()
+
+    result = _combine(match_norm, match_raw, a_source, b_source)
+
+    if DEBUG_KEYWORDS:
+        _debug_report(a_title, b_title, result)
+
     return result
 
+def title_similarity_at_least(a="", b="", threshold=0.75) -> bool:
+    """Same decision as `title_similarity(a, b) >= threshold`, but rejects obviously
+    different titles early.
+
+    The final score is at most max(normalized ratio, raw ratio) plus the same-source
+    bonus, so cheap upper bounds of both ratios (length ratio via real_quick_ratio,
+    then character multiset overlap via quick_ratio) are tried first, and the two
+    full ratio() calls only run for pairs that could still reach the threshold.
+    """
+    a_title, a_source = _title_and_source(a)
+    b_title, b_source = _title_and_source(b)
+
+    a_norm = _normalized_title(a, a_title, a_source)
+    b_norm = _normalized_title(b, b_title, b_source)
+    contained = a_norm in b_norm or b_norm in a_norm
+    boost = 0.30 if contained else 0.0
+    bonus = 0.05 if a_source and b_source and a_source == b_source else 0.0
+
+    sm_norm = SequenceMatcher(None, a_norm, b_norm)
+    sm_raw = SequenceMatcher(None, a_title.lower(), b_title.lower())
+
+    for bound in ("real_quick_ratio", "quick_ratio"):
+        upper_norm = min(1.0, getattr(sm_norm, bound)() + boost)
+        upper_raw = getattr(sm_raw, bound)()
+        if max(upper_norm, upper_raw) + bonus + _BOUND_EPSILON < threshold:
+            return False
+
+    match_norm = min(1.0, sm_norm.ratio() + boost) if contained else sm_norm.ratio()
+    result = _combine(match_norm, sm_raw.ratio(), a_source, b_source)
+
+    if DEBUG_KEYWORDS:
+        _debug_report(a_title, b_title, result)
+
+    return result >= threshold
+
 def title_similar(a="", b="", threshold=0.75):
-    return title_similarity(a, b) >= threshold
+    return title_similarity_at_least(a, b, threshold)
 
-def duration_close(d1: int, d2: int, duration_tolerance_ms=5000) -> bool:
+def duration_close(d1: int, d2: int, duration_tolerance_ms=DURATION_TOLERANCE_MS) -> bool:
     return d1 and d2 and abs(d1 - d2) <= duration_tolerance_ms
 
 def is_match(e, t):
@@ -0,0 +1,150 @@
+import os
+import json
+from typing import List, Tuple
+from .cache import open_cache_db
+from .config import get_config
+from .staging import STAGING_DIR_NAME
+
+# (path, filename, size, mtime_ns)
+FileEntry = Tuple[str, str, int, int]
+
+
+class DirCache:
+    """Per-directory listing cache used to skip unchanged subtrees on rescans.
+
+    For every directory visited we remember its mtime plus the files (with size
+    and mtime_ns) and subdirectories it contained. Adding, removing or renaming
+    an entry bumps the mtime of the directory holding it, so a directory whose
+    mtime is unchanged can reuse its cached listing without a scandir.
+
+    Rows are keyed by absolute directory path so a full scan and a scan of one
+    of its subfolders share entries.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.conn = open_cache_db("library")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " files TEXT NOT NULL,"
+            " subdirs TEXT NOT NULL)"
+        )
+        # everything below root sorts between "root/" and "root0" ("0" follows "/" in ASCII)
+        prefix = os.path.join(self.root, "")
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        self._entries = {
+            path: (mtime_ns, files, subdirs)
+            for path, mtime_ns, files, subdirs in self.conn.execute(
+                "SELECT path, mtime_ns, files, subdirs FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (self.root, prefix, upper)
+            )
+        }
+        self._seen = set()
+        self._pending = []
+        self.reused = 0
+        self.listed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(evict=exc_type is None)
+
+    def listing(self, directory: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+        """Return ([(filename, size, mtime_ns)], [subdir names]) for `directory`."""
+        key = os.path.abspath(directory)
+        self._seen.add(key)
+        mtime_ns = os.stat(directory).st_mtime_ns
+
+        entry = self._entries.get(key)
+        if entry and entry[0] == mtime_ns:
+            self.reused += 1
+            return json.loads(entry[1]), json.loads(entry[2])
+
+        self.listed += 1
+        files, subdirs = _list_directory(directory)
+        self._pending.append((key, mtime_ns, json.dumps(files), json.dumps(subdirs)))
+        return files, subdirs
+
+    def close(self, evict: bool = True):
+        with self.conn:
+            if self._pending:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO dirs (path, mtime_ns, files, subdirs) VALUES (?, ?, ?, ?)",
+                    self._pending
+                )
+            if evict:
+                stale = [(p,) for p in self._entries if p not in self._seen]
+                if stale:
+                    self.conn.executemany("DELETE FROM dirs WHERE path = ?", stale)
+        self.conn.close()
+
+
+def _list_directory(directory: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    files = []
+    subdirs = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                # like os.walk(followlinks=False): list symlinked dirs but don't descend into them
+                if entry.is_dir(follow_symlinks=False):
+                    # downloads in progress are staged here, they're not part of the library yet
+                    if entry.name != STAGING_DIR_NAME:
+                        subdirs.append(entry.name)
+                    continue
+                if entry.is_dir():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            files.append((entry.name, st.st_size, st.st_mtime_ns))
+    return files, subdirs
+
+
+def scan_directory(base_dir: str, incremental: bool = None, skipped: List[str] = None) -> List[FileEntry]:
+    """Recursively list every file below base_dir as (path, filename, size, mtime_ns),
+    in the same top-down order as os.walk.
+
+    With incremental scanning (library_scan.skip_unchanged_directories in config.json)
+    directories whose mtime did not change since the previous scan are served from the
+    DirCache, so a rescan costs one stat per directory plus a scandir for each changed one.
+    It is off by default because of two caveats:
+    - rewriting a file in place (e.g. editing its tags) does not touch the mtime of its
+      directory, so TrackCache gets the cached size and mtime and such edits are only
+      picked up once that directory changes;
+    - some filesystems (FAT/exFAT in particular) don't reliably update directory mtimes,
+      so even new files can go unnoticed there.
+
+    Directories that can't be read are left out with a warning and appended to `skipped`
+    (when given), so callers can tell a complete listing from a partial one.
+    """
+    if incremental is None:
+        incremental = get_config().get("library_scan", {}).get("skip_unchanged_directories", False)
+
+    results: List[FileEntry] = []
+    if not os.path.isdir(base_dir):
+        return results
+
+    def walk(directory, listing):
+        try:
+            files, subdirs = listing(directory)
+        except OSError as e:
+            print(f"Skipping unreadable directory '{directory}': {e}")
+            if skipped is not None:
+                skipped.append(directory)
+            return
+        for name, size, mtime_ns in files:
+            results.append((os.path.join(directory, name), name, size, mtime_ns))
+        for name in subdirs:
+            walk(os.path.join(directory, name), listing)
+
+    if not incremental:
+        walk(base_dir, _list_directory)
+        return results
+
+    with DirCache(base_dir) as dir_cache:
+        walk(base_dir, dir_cache.listing)
+    print(f"Scanned '{base_dir}': {dir_cache.listed} directories listed, {dir_cache.reused} unchanged")
+    return results
@@ -1,10 +1,18 @@
 from . import get_config
 from .placeholders import placeholders
 from .sanitize_path import sanitize_path
+from .compare import is_match
+from .tag_reader import read_track
+from .ledger import record_download
+from .staging import STAGING_DIR_NAME, get_staging_root, finalize
 from SpotiFLAC import SpotiFLAC
 import os
 import subprocess
 import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 
 
 
@@ -18,102 +26,299 @@ def find_scdl() -> str:
     else:
         return None
 
-os.makedirs(get_config()['output']['base_directory'], exist_ok=True)
-os.makedirs(get_config()['temp_directory'], exist_ok=True)
-# Clear temp directory
-for f in os.listdir(get_config()['temp_directory']):
-    os.remove(os.path.join(get_config()['temp_directory'], f))
+def init_download_directories():
+    """Create the output and temp directories and clear leftovers of previous runs from
+    temp_directory and the output staging directory (job directories included).
 
-def download_song(track):
+    Call once at program start, before any download: importing this module must not do it,
+    since library scan worker processes import it too and would wipe running jobs."""
+    config = get_config()
+    os.makedirs(config['output']['base_directory'], exist_ok=True)
+    os.makedirs(config['temp_directory'], exist_ok=True)
+    for directory in (config['temp_directory'], os.path.join(config['output']['base_directory'], STAGING_DIR_NAME)):
+        if not os.path.isdir(directory):
+            continue
+        for f in os.listdir(directory):
+            path = os.path.join(directory, f)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+def _move_to_output(track, temp_path: str, extension: str, config) -> str:
+    relative_path = placeholders(
+        track,
+        config['output']['filename_format'],
+        extension
+    )
+
+    relative_path = sanitize_path(relative_path)
+
+    final_path = os.path.abspath(os.path.normpath(
+        os.path.join(config['output']['base_directory'], relative_path)
+    ))
+
+    final_dir = os.path.dirname(final_path)
+    os.makedirs(final_dir, exist_ok=True)
+
+    finalize(temp_path, final_path)
+    print(f"Downloaded '{track['title']}' to '{final_path}'")
+    record_download(track, final_path)
+    return final_path
+
+def download_song(track) -> list[str]:
+    """Download one track into the output directory and return the final paths
+    (empty if the download failed).
+
+    Every call stages its files in its own job directory (see get_staging_root), so
+    several downloads can run at the same time (see DownloadExecutor)."""
     config = get_config()
     
     if not track.get('url'):
         print(f"Missing URL for '{track['title']}'") # somehow
-        return
+        return []
 
-    if track['source'].lower() != 'soundcloud':
-        SpotiFLAC(
-            url=track.get('url'),
-            output_dir=config['temp_directory'],
-            services=["tidal", "deezer", "qobuz", "amazon"],
-            filename_format="download.flac",
-            loop=None
-        )
+    job_dir = tempfile.mkdtemp(prefix="job-", dir=get_staging_root(config))
+    try:
+        if track['source'].lower() != 'soundcloud':
+            return _download_spotiflac(track, job_dir, config)
+        # SoundCloud tracks
+        return _download_scdl(track, job_dir, config)
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
 
+def _run_spotiflac(url: str, job_dir: str, filename_format: str):
+    SpotiFLAC(
+        url=url,
+        output_dir=job_dir,
+        services=["tidal", "deezer", "qobuz", "amazon"],
+        filename_format=filename_format,
+        loop=None
+    )
+
+def _run_scdl(url: str, job_dir: str, title: str) -> bool:
+    scdl_path = find_scdl()
+    if not scdl_path:
+        print("scdl not found in PATH. Please install scdl and ensure it's accessible from the command line.")
+        return False
+    
+    command = [
+        f'"{scdl_path}"',
+        "-l",
+        f'"{url}"',
+        "--path",
+        f'"{os.path.abspath(job_dir)}"',
+        "--flac",
+        "--force-metadata"
+    ]
+    command = " ".join(command)
+    print(f"Running command: {command}")
+    result = subprocess.run(command, shell=True, capture_output=True)
+    if result.returncode != 0:
+        print(f"Error downloading '{title}' from SoundCloud:")
+        print(result.stderr.decode(encoding = "ISO-8859-1")) # to avoid decode errors
+        return False
+    print(result.stdout.decode(encoding = "ISO-8859-1"))
+    return True
+
+def _download_spotiflac(track, job_dir: str, config) -> list[str]:
+    _run_spotiflac(track.get('url'), job_dir, "download.flac")
+
+    temp_path = os.path.abspath(
+        os.path.join(job_dir, "download.flac")
+    )
+    if not os.path.exists(temp_path):
+        return []
+    return [_move_to_output(track, temp_path, ".flac", config)]
+
+def _download_scdl(track, job_dir: str, config) -> list[str]:
+    if not _run_scdl(track["url"], job_dir, track["title"]):
+        return []
+
+    # the job directory only ever holds this download
+    new_files = os.listdir(job_dir)
+    print(f"New files from scdl: {new_files}")
+    final_paths = []
+    for file in new_files: # should only be one
         temp_path = os.path.abspath(
-            os.path.join(config['temp_directory'], "download.flac")
+            os.path.join(job_dir, file)
         )
+        if os.path.isfile(temp_path):
+            # keep original extension
+            final_paths.append(_move_to_output(track, temp_path, "." + file.rpartition(".")[-1], config))
+    return final_paths
 
-        relative_path = placeholders(
-            track,
-            config['output']['filename_format'],
-            ".flac"
-        )
+def download_album(tracks: list[dict]) -> list[list[str]]:
+    """Download tracks sharing one album_url (album or playlist) with a single SpotiFLAC
+    call or scdl run, then move each resulting file to the final path of the track it
+    belongs to. Returns the final paths for each track, in order.
 
-        relative_path = sanitize_path(relative_path)
+    Files are matched back to tracks by ISRC, then by title and duration (is_match).
+    Files of album tracks that weren't asked for are dropped with the job directory, and
+    tracks without a matching file fall back to download_song."""
+    config = get_config()
+    album_url = tracks[0]["album_url"]
+    print(f"Downloading {len(tracks)} tracks of '{tracks[0].get('album')}' from {album_url}")
 
+    results: list[list[str]] = [[] for _ in tracks]
+    job_dir = tempfile.mkdtemp(prefix="album-", dir=get_staging_root(config))
+    try:
+        try:
+            if _backend(tracks[0]) == "scdl":
+                _run_scdl(album_url, job_dir, tracks[0].get("album"))
+            else:
+                _run_spotiflac(album_url, job_dir, "{title} - {artist}")
+        except Exception as e:
+            # whatever did get downloaded is still used, the rest goes through download_song
+            print(f"Album download of {album_url} failed: {e}")
 
-        final_path = os.path.abspath(os.path.normpath(
-            os.path.join(config['output']['base_directory'], relative_path)
-        ))
+        files = []
+        for root, _, fnames in os.walk(job_dir):  # scdl puts playlists in a subfolder
+            for fname in fnames:
+                parsed = read_track(os.path.join(root, fname), fname)
+                if parsed:
+                    files.append(parsed)
 
-        final_dir = os.path.dirname(final_path)
-        os.makedirs(final_dir, exist_ok=True)
+        for i, track in enumerate(tracks):
+            found = next((f for f in files if track.get("isrc") and f.get("isrc") == track["isrc"]), None)
+            if found is None:
+                found = next((f for f in files if is_match(f, track)), None)
+            if found is None:
+                continue
+            files.remove(found)
+            extension = os.path.splitext(found["filename"])[1]
+            results[i] = [_move_to_output(track, found["path"], extension, config)]
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
 
-        if os.path.exists(temp_path):
-            shutil.move(temp_path, final_path)
-            print(f"Downloaded '{track['title']}' to '{final_path}'")
-    
-    
-    # SoundCloud tracks
-    elif track['source'].lower() == 'soundcloud':
-        temp_files = os.listdir(config['temp_directory'])
-
-        scdl_path = find_scdl()
-        if not scdl_path:
-            print("scdl not found in PATH. Please install scdl and ensure it's accessible from the command line.")
-            return
-        
-        command = [
-            f'"{scdl_path}"',
-            "-l",
-            f'"{track["url"]}"',
-            "--path",
-            f'"{os.path.abspath(config["temp_directory"])}"',
-            "--flac",
-            "--force-metadata"
-        ]
-        command = " ".join(command)
-        print(f"Running command: {command}")
-        result = subprocess.run(command, shell=True, capture_output=True)
-        if result.returncode != 0:
-            print(f"Error downloading '{track['title']}' from SoundCloud:")
-            print(result.stderr.decode(encoding = "ISO-8859-1")) # to avoid decode errors
-            return
-        print(result.stdout.decode(encoding = "ISO-8859-1"))
-
-        new_files = set(os.listdir(config['temp_directory'])) - set(temp_files)
-        print(f"New files from scdl: {new_files}")
-        for file in new_files: # should only be one
-            temp_path = os.path.abspath(
-                os.path.join(config['temp_directory'], file)
-            )
+    # per-track mode for whatever the album download didn't cover
+    for i, track in enumerate(tracks):
+        if not results[i]:
+            print(f"'{track['title']}' not found in the album download, downloading it on its own")
+            results[i] = download_song(track)
+    return results
+
+def group_by_album(tracks: list[dict]) -> tuple[list[list[dict]], list[dict]]:
+    """Split tracks into album batches (for download_album) and tracks to download one by one.
+
+    Tracks are batched per album_url when there are at least two of them and they make up
+    at least download.album_batch_ratio of the album (album_track_count), so an album that
+    is mostly present locally isn't downloaded in full for one or two tracks."""
+    download_config = get_config().get("download", {})
+    if not download_config.get("album_batch", True):
+        return [], list(tracks)
+    min_ratio = download_config.get("album_batch_ratio", 0.75)
+
+    groups: dict[tuple, list[dict]] = {}
+    for track in tracks:
+        if track.get("album_url") and track.get("url"):
+            groups.setdefault((_backend(track), track["album_url"]), []).append(track)
+
+    albums = []
+    batched = set()
+    for group in groups.values():
+        album_size = group[0].get("album_track_count") or 0
+        if len(group) >= 2 and album_size and len(group) >= min_ratio * album_size:
+            albums.append(group)
+            batched.update(id(t) for t in group)
+    return albums, [t for t in tracks if id(t) not in batched]
+
+
+def _backend(track) -> str:
+    return "scdl" if (track.get('source') or '').lower() == 'soundcloud' else "spotiflac"
+
+class DownloadExecutor:
+    """Runs download_song on one thread pool per backend, sized by download.workers
+    in config.json (e.g. {"spotiflac": 2, "scdl": 2}), so SoundCloud downloads don't
+    wait behind SpotiFLAC ones and each backend's load can be tuned on its own.
+
+    With max_pending set, submit() blocks while that many downloads are queued or
+    running, which gives producers backpressure. With a DownloadJournal every job's
+    progress is recorded so an interrupted run can be resumed.
 
-            relative_path = placeholders(
-                track,
-                config['output']['filename_format'],
-                "." + file.rpartition(".")[-1]  # keep original extension
+    Usage:
+        with DownloadExecutor() as executor:
+            futures = executor.submit_all(tracks)  # or executor.submit(track) for one track
+        # each future resolves to the track's list of final paths
+    """
+
+    def __init__(self, workers: dict = None, max_pending: int = None, journal=None):
+        if workers is None:
+            workers = get_config().get("download", {}).get("workers", {})
+        self._pools = {
+            backend: ThreadPoolExecutor(
+                max_workers=max(1, workers.get(backend, 1)),
+                thread_name_prefix=f"download-{backend}"
             )
+            for backend in ("spotiflac", "scdl")
+        }
+        self._pending = threading.BoundedSemaphore(max_pending) if max_pending else None
+        self.journal = journal
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def submit(self, track) -> Future:
+        return self._submit(_backend(track), self._download_song, track)
+
+    def submit_all(self, tracks: list[dict]) -> list[Future]:
+        """Submit tracks, downloading the albums found by group_by_album in one go each.
+        Returns one future per track (in order) resolving to that track's final paths."""
+        albums, singles = group_by_album(tracks)
+        futures = {}
+        for album in albums:
+            album_future = self._submit(_backend(album[0]), self._download_album, album)
+            track_futures = [Future() for _ in album]
+            album_future.add_done_callback(partial(_fan_out, track_futures))
+            futures.update((id(t), f) for t, f in zip(album, track_futures))
+        for track in singles:
+            futures[id(track)] = self.submit(track)
+        return [futures[id(t)] for t in tracks]
 
-            relative_path = sanitize_path(relative_path)
+    # with a DownloadJournal, every job is recorded as in_progress, then done or failed
 
-            final_path = os.path.abspath(os.path.normpath(
-                os.path.join(config['output']['base_directory'], relative_path)
-            ))
+    def _download_song(self, track) -> list[str]:
+        return self._journaled([track], lambda: [download_song(track)])[0]
 
-            final_dir = os.path.dirname(final_path)
-            os.makedirs(final_dir, exist_ok=True)
+    def _download_album(self, tracks: list[dict]) -> list[list[str]]:
+        return self._journaled(tracks, lambda: download_album(tracks))
 
-            if os.path.exists(temp_path):
-                shutil.move(temp_path, final_path)
-                print(f"Downloaded '{track['title']}' to '{final_path}'")
+    def _journaled(self, tracks: list[dict], download) -> list[list[str]]:
+        if self.journal:
+            for track in tracks:
+                self.journal.start(track)
+        try:
+            results = download()
+        except Exception as e:
+            if self.journal:
+                for track in tracks:
+                    self.journal.finish(track, error=str(e))
+            raise
+        if self.journal:
+            for track, paths in zip(tracks, results):
+                # without a URL there's nothing to retry
+                self.journal.finish(track, paths, permanent=not track.get('url'))
+        return results
+
+    def _submit(self, backend: str, fn, *args) -> Future:
+        if self._pending:
+            self._pending.acquire()
+        future = self._pools[backend].submit(fn, *args)
+        if self._pending:
+            future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def shutdown(self, wait: bool = True):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+
+def _fan_out(track_futures: list[Future], album_future: Future):
+    if album_future.exception() is not None:
+        for f in track_futures:
+            f.set_exception(album_future.exception())
+        return
+    for f, paths in zip(track_futures, album_future.result()):
+        f.set_result(paths)
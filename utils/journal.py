@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+from .cache import get_cache_directory
+from .config import get_config
+
+JOURNAL_FILE = "downloads.jsonl"
+
+PLANNED = "planned"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_key(track: Dict) -> Optional[str]:
+    if not track.get("provider_id"):
+        return None
+    return f"{(track.get('source') or '').lower()}:{track['provider_id']}"
+
+class DownloadJournal:
+    """Append-only log of download jobs, so an interrupted run can pick up where it stopped.
+
+    Every state change (planned, in_progress, done, failed) appends one JSON line to
+    `<cache_directory>/downloads.jsonl`, keyed by source and provider_id; the last line
+    of a job wins when the file is replayed. Planned entries carry the whole track dict,
+    so unfinished jobs can be downloaded again without fetching or rescanning anything.
+    A line cut short by a crash is ignored.
+
+    Failed jobs are retried with exponential backoff: journal.retry_backoff seconds
+    after the first failure, doubling each time, up to journal.max_attempts attempts.
+    Permanent failures (e.g. a track without a URL) are never retried.
+    A done job only counts as done while one of its downloaded files still exists,
+    so deleting a download lets it be planned and fetched again.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(get_cache_directory(), JOURNAL_FILE)
+        journal_config = get_config().get("journal", {})
+        self.retry_backoff = journal_config.get("retry_backoff", 30)
+        self.max_attempts = journal_config.get("max_attempts", 5)
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, Dict] = {}
+        self._replay()
+
+    def _replay(self):
+        self._torn = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # partially written line
+                    job = self.jobs.setdefault(entry["key"], {})
+                    job.update(entry)
+        except OSError:
+            pass
+
+    def _append(self, key: str, **entry):
+        entry = {"key": key, "at": time.time(), **entry}
+        with self._lock:
+            job = self.jobs.setdefault(key, {})
+            job.update(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if self._torn:
+                    # terminate a line cut short by a crash, so it doesn't swallow this one
+                    f.write("\n")
+                    self._torn = False
+                f.write(json.dumps(entry, default=str) + "\n")
+
+    def plan(self, tracks: List[Dict], artist: str = None):
+        """Record tracks about to be downloaded. Tracks already done are left alone."""
+        for track in tracks:
+            key = job_key(track)
+            if key and not self.is_done(track):
+                # a done job whose files are gone starts over with a clean slate
+                attempts = 0 if self.state(track) == DONE else self.jobs.get(key, {}).get("attempts", 0)
+                self._append(key, state=PLANNED, artist=(artist or "").lower(), track=track, attempts=attempts)
+
+    def start(self, track: Dict):
+        key = job_key(track)
+        if key:
+            self._append(key, state=IN_PROGRESS)
+
+    def finish(self, track: Dict, paths: List[str] = None, error: str = None, permanent: bool = False):
+        """Record the outcome of a download: done when it produced files, failed otherwise.
+        A permanent failure is never retried."""
+        key = job_key(track)
+        if not key:
+            return
+        if paths and not error:
+            self._append(key, state=DONE, paths=paths)
+        else:
+            attempts = self.jobs.get(key, {}).get("attempts", 0) + 1
+            self._append(key, state=FAILED, attempts=attempts, error=error or "no file downloaded", permanent=permanent)
+
+    def state(self, track: Dict) -> Optional[str]:
+        return self.jobs.get(job_key(track), {}).get("state")
+
+    def _files_exist(self, job: Dict) -> bool:
+        return any(os.path.exists(path) for path in job.get("paths") or [])
+
+    def is_done(self, track: Dict) -> bool:
+        """True if the track was downloaded and at least one of its files is still there."""
+        job = self.jobs.get(job_key(track), {})
+        return job.get("state") == DONE and self._files_exist(job)
+
+    def _retry_delay(self, job: Dict, now: float) -> Optional[float]:
+        """Seconds until a failed job may be retried, None if it never will be."""
+        attempts = job.get("attempts", 1)
+        if job.get("permanent") or attempts >= self.max_attempts:
+            return None
+        return max(0.0, job["at"] + self.retry_backoff * 2 ** (attempts - 1) - now)
+
+    def should_download(self, track: Dict) -> bool:
+        """False for tracks that are done (and still on disk), being downloaded, or failed
+        and not due for a retry."""
+        job = self.jobs.get(job_key(track))
+        if not job or job.get("state") == PLANNED:
+            return True
+        if job.get("state") == DONE:
+            return not self._files_exist(job)
+        if job.get("state") == FAILED:
+            return self._retry_delay(job, time.time()) == 0
+        return False
+
+    def pending(self, artist: str = None) -> List[Tuple[Dict, float]]:
+        """Unfinished jobs (optionally only those planned for `artist`) as (track, delay):
+        planned or interrupted jobs can start right away, failed ones after their backoff.
+        Jobs that failed permanently or used up journal.max_attempts are left out."""
+        now = time.time()
+        pending = []
+        for job in self.jobs.values():
+            if "track" not in job or job.get("state") == DONE:
+                continue
+            if artist is not None and job.get("artist") != artist.lower():
+                continue
+            delay = 0.0
+            if job.get("state") == FAILED:
+                delay = self._retry_delay(job, now)
+                if delay is None:
+                    continue
+            pending.append((job["track"], delay))
+        return sorted(pending, key=lambda p: p[1])
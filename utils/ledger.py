@@ -0,0 +1,99 @@
+import os
+from typing import Dict, Iterable, Optional
+from .cache import open_cache_db
+from .config import get_config
+
+
+def _ensure_table(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ledger ("
+        " source TEXT NOT NULL,"
+        " provider_id TEXT NOT NULL,"
+        " isrc TEXT,"
+        " path TEXT NOT NULL,"
+        " PRIMARY KEY (source, provider_id))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ledger_path ON ledger (path)")
+
+def ledger_enabled() -> bool:
+    return get_config().get("matching", {}).get("ledger", True)
+
+def record_download(track: Dict, path: str):
+    """Remember that `track` was downloaded to `path`."""
+    if not track.get("provider_id") or not ledger_enabled():
+        return
+    conn = open_cache_db("library")
+    try:
+        _ensure_table(conn)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ledger (source, provider_id, isrc, path) VALUES (?, ?, ?, ?)",
+                ((track.get("source") or "").lower(), str(track["provider_id"]), track.get("isrc"), os.path.abspath(path))
+            )
+    finally:
+        conn.close()
+
+def prune_ledger(root: str, existing_paths: Iterable[str]):
+    """Drop entries below `root` whose file is not among `existing_paths` anymore
+    (called after a complete library scan of `root`)."""
+    if not ledger_enabled():
+        return
+    existing = {os.path.abspath(p) for p in existing_paths}
+    prefix = os.path.join(os.path.abspath(root), "")
+    conn = open_cache_db("library")
+    try:
+        _ensure_table(conn)
+        # everything below root sorts between "root/" and "root0" ("0" follows "/" in ASCII)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        stale = [
+            (path,)
+            for (path,) in conn.execute("SELECT path FROM ledger WHERE path >= ? AND path < ?", (prefix, upper))
+            if path not in existing
+        ]
+        if stale:
+            with conn:
+                conn.executemany("DELETE FROM ledger WHERE path = ?", stale)
+            print(f"Removed {len(stale)} downloaded-track ledger entries whose file is gone")
+    finally:
+        conn.close()
+
+
+class DownloadLedger:
+    """In-memory view of the downloaded-track ledger, for constant time lookups.
+
+    The ledger maps (source, provider_id) and ISRC of every track downloaded by
+    download_song to the file it was saved as, so later runs can drop those tracks
+    without fuzzy matching them against the library (which breaks when tags differ).
+    Entries whose file disappeared are removed by prune_ledger during library scans.
+    """
+
+    def __init__(self):
+        self._keys: Dict[tuple, str] = {}
+        self._isrcs: Dict[str, str] = {}
+        self._use_isrc = get_config().get("matching", {}).get("isrc", True)
+        if not ledger_enabled():
+            return
+        conn = open_cache_db("library")
+        try:
+            _ensure_table(conn)
+            for source, provider_id, isrc, path in conn.execute("SELECT source, provider_id, isrc, path FROM ledger"):
+                self._keys[(source, provider_id)] = path
+                if isrc:
+                    self._isrcs[isrc] = path
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def knows(self, track: Dict) -> bool:
+        """True if this track (or a release with the same ISRC) was already downloaded
+        and its file is still there (one stat, so directories that aren't scanned can't
+        hide a deleted download)."""
+        path = None
+        if track.get("provider_id"):
+            path = self._keys.get(((track.get("source") or "").lower(), str(track["provider_id"])))
+        isrc: Optional[str] = track.get("isrc")
+        if path is None and self._use_isrc and isrc:
+            path = self._isrcs.get(isrc)
+        return path is not None and os.path.exists(path)
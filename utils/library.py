@@ -0,0 +1,344 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from typing import List, Dict, Optional, Tuple
+from .config import get_config
+from .dir_cache import scan_directory, FileEntry
+from .local_tracks import get_local_tracks
+from .tag_reader import read_track
+from .staging import STAGING_DIR_NAME
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Minimal ctypes binding over the Linux inotify API (no third party dependency)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self) -> List[Tuple[int, int, int, str]]:
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LocalLibrary:
+    """Long-lived, in-memory index of the local music directories.
+
+    On Linux an inotify watcher keeps the index current as files are created,
+    rewritten, moved or deleted, so lookups never walk the disk again. Elsewhere
+    (or when inotify is unavailable, e.g. the watch limit is reached) there is no
+    in-memory index: each query scans only the directory asked for, through the
+    on-disk caches of get_local_tracks / scan_directory.
+
+    All paths are stored absolute; files() re-roots them on the directory asked for.
+    """
+
+    def __init__(self, directories: List[str]):
+        self.directories = [os.path.abspath(d) for d in directories if d]
+        self.live = False
+        self._lock = threading.RLock()
+        self._files: Dict[str, Tuple[int, int]] = {}  # path -> (size, mtime_ns), every file
+        self._tracks: Dict[str, Dict] = {}            # path -> track dict, audio files only
+        self._audio_extensions = set(ext.lower() for ext in get_config().get("audio_extensions", []))
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, str] = {}             # wd -> directory path
+        self._stop_r, self._stop_w = None, None
+        self._thread: Optional[threading.Thread] = None
+        self._refresh_lock = threading.RLock()
+        self._deferred: Optional[List[Tuple[int, int, int, str]]] = None  # events held back during refresh()
+
+    def start(self) -> "LocalLibrary":
+        if sys.platform.startswith("linux"):
+            try:
+                self._start_watcher()
+            except OSError as e:
+                print(f"Library watcher unavailable ({e}), falling back to rescans")
+                self._stop_watcher()
+        if self.live:
+            # the initial scan runs after the watches are in place so nothing slips through
+            self.refresh()
+        return self
+
+    def stop(self):
+        self._stop_watcher()
+
+    def covers(self, directory: str) -> bool:
+        directory = os.path.abspath(directory)
+        return any(directory == d or directory.startswith(os.path.join(d, "")) for d in self.directories)
+
+    def refresh(self):
+        """Rebuild the whole index from disk (served mostly from the on-disk caches).
+
+        Watcher events arriving while the scan runs are held back and applied on top
+        of the new snapshot once it is swapped in, so none of them is lost."""
+        with self._refresh_lock:
+            with self._lock:
+                self._deferred = []
+            try:
+                files: Dict[str, Tuple[int, int]] = {}
+                tracks: Dict[str, Dict] = {}
+                for directory in self.directories:
+                    # list the tree once, get_local_tracks reuses the listing
+                    skipped: List[str] = []
+                    entries = scan_directory(directory, skipped=skipped)
+                    for path, _, size, mtime_ns in entries:
+                        files[path] = (size, mtime_ns)
+                    for track in get_local_tracks(directory, listing=entries, skipped=skipped):
+                        tracks[track["path"]] = track
+                with self._lock:
+                    self._files = files
+                    self._tracks = tracks
+            finally:
+                # replay in arrival order; events coming in meanwhile keep being deferred
+                while True:
+                    with self._lock:
+                        events, self._deferred = self._deferred, ([] if self._deferred else None)
+                    if not events:
+                        break
+                    for event in events:
+                        self._dispatch(event)
+
+    def tracks(self, directory: str = None) -> List[Dict]:
+        """Return local track dicts, optionally restricted to those below `directory`."""
+        if not self.live:
+            directories = self.directories if directory is None else [directory]
+            return [t for d in directories for t in get_local_tracks(d)]
+        with self._lock:
+            if directory is None:
+                return list(self._tracks.values())
+            prefix = os.path.join(os.path.abspath(directory), "")
+            return [t for p, t in self._tracks.items() if p.startswith(prefix)]
+
+    def files(self, directory: str) -> List[FileEntry]:
+        """Return (path, filename, size, mtime_ns) for every file below `directory`,
+        with paths joined onto `directory` as given, like scan_directory does."""
+        if not self.live:
+            return scan_directory(directory)
+        root = os.path.abspath(directory)
+        prefix = os.path.join(root, "")
+        with self._lock:
+            return [
+                (os.path.join(directory, os.path.relpath(p, root)), os.path.basename(p), size, mtime_ns)
+                for p, (size, mtime_ns) in self._files.items()
+                if p.startswith(prefix)
+            ]
+
+    # --- watcher ---------------------------------------------------------
+
+    def _start_watcher(self):
+        self._inotify = _Inotify()
+        for directory in self.directories:
+            if os.path.isdir(directory):
+                self._watch_tree(directory)
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="LocalLibraryWatcher", daemon=True)
+        self._thread.start()
+        self.live = True
+
+    def _stop_watcher(self):
+        self.live = False
+        if self._stop_w is not None:
+            os.write(self._stop_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for fd in (self._stop_r, self._stop_w):
+            if fd is not None:
+                os.close(fd)
+        self._stop_r, self._stop_w = None, None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches.clear()
+
+    def _watch_tree(self, directory: str):
+        for root, dirs, _ in os.walk(directory):
+            # downloads are staged there and renamed into place, so they show up as IN_MOVED_TO
+            dirs[:] = [d for d in dirs if d != STAGING_DIR_NAME]
+            try:
+                wd = self._inotify.add_watch(root, WATCH_MASK)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    continue  # removed while walking
+                raise
+            self._watches[wd] = root
+
+    def _run(self):
+        while True:
+            ready, _, _ = select.select([self._inotify.fd, self._stop_r], [], [])
+            if self._stop_r in ready:
+                return
+            try:
+                events = self._inotify.read_events()
+            except OSError:
+                return
+            for event in events:
+                with self._lock:
+                    if self._deferred is not None:
+                        # refresh() in progress: applied on top of its snapshot afterwards
+                        self._deferred.append(event)
+                        continue
+                self._dispatch(event)
+
+    def _dispatch(self, event: Tuple[int, int, int, str]):
+        try:
+            self._handle_event(*event)
+        except Exception as e:
+            # never let one bad event kill the watcher
+            print(f"Library watcher error: {e}")
+
+    def _handle_event(self, wd: int, mask: int, cookie: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            print("Library watcher queue overflowed, rescanning")
+            self.refresh()
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+
+        directory = self._watches.get(wd)
+        if directory is None or not name:
+            return  # IN_DELETE_SELF / IN_MOVE_SELF are handled through the parent's events
+        path = os.path.join(directory, name)
+
+        if mask & IN_ISDIR:
+            if name == STAGING_DIR_NAME:
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._remove_tree(path)
+            return
+
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._remove_file(path)
+        elif mask & (IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB):
+            # a file being written gets IN_CREATE then IN_CLOSE_WRITE: only parse once it's complete
+            self._add_file(path, parse=not (mask & IN_CREATE))
+
+    def _add_file(self, path: str, parse: bool = True):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._remove_file(path)
+            return
+        track = None
+        ext = os.path.splitext(path)[1].lower()
+        if parse and ext in self._audio_extensions:
+            track = read_track(path, os.path.basename(path))
+        with self._lock:
+            self._files[path] = (st.st_size, st.st_mtime_ns)
+            if track:
+                self._tracks[path] = track
+            elif parse:
+                # rewritten into something mutagen can't read (or not audio anymore)
+                self._tracks.pop(path, None)
+
+    def _remove_file(self, path: str):
+        with self._lock:
+            self._files.pop(path, None)
+            self._tracks.pop(path, None)
+
+    def _add_tree(self, directory: str):
+        # files may already exist in a directory moved in (or created) before its watch was added
+        try:
+            self._watch_tree(directory)
+        except OSError as e:
+            print(f"Failed to watch '{directory}' ({e}), falling back to rescans")
+            self.live = False
+            return
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d != STAGING_DIR_NAME]
+            for fname in files:
+                self._add_file(os.path.join(root, fname))
+
+    def _remove_tree(self, directory: str):
+        prefix = os.path.join(directory, "")
+        with self._lock:
+            for path in [p for p in self._files if p.startswith(prefix)]:
+                self._files.pop(path, None)
+                self._tracks.pop(path, None)
+        for wd, path in list(self._watches.items()):
+            if path == directory or path.startswith(prefix):
+                # a moved-away directory keeps its watch, drop it so events stop arriving
+                self._inotify.rm_watch(wd)
+                self._watches.pop(wd, None)
+
+
+_LIBRARY: Optional[LocalLibrary] = None
+_LIBRARY_LOCK = threading.Lock()
+
+def start_local_library(directories: List[str] = None) -> LocalLibrary:
+    """Start (or restart) the shared LocalLibrary. Defaults to music_directory and
+    the output base_directory from config.json."""
+    global _LIBRARY
+    if directories is None:
+        config = get_config()
+        directories = [config.get("music_directory"), config.get("output", {}).get("base_directory")]
+    with _LIBRARY_LOCK:
+        if _LIBRARY is not None:
+            _LIBRARY.stop()
+            _LIBRARY = None
+        started = time.time()
+        _LIBRARY = LocalLibrary(directories).start()
+        print(f"Local library ready in {time.time() - started:.2f}s (live={_LIBRARY.live})")
+        return _LIBRARY
+
+def get_local_library() -> Optional[LocalLibrary]:
+    """Return the shared LocalLibrary if one was started, else None."""
+    return _LIBRARY
@@ -1,107 +1,167 @@
 import os
-from typing import List, Dict
-from mutagen import File as MutagenFile
-from .normalize import normalize_title_for_similarity
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
 from .compare import is_match
 from .config import get_config
+from .track_cache import TrackCache
+from .dir_cache import scan_directory, FileEntry
+from .match_index import TitleIndex
+from .ledger import prune_ledger
+from .staging import is_staging_path
+from .tag_reader import read_tracks
 
 
-def _easy_tag(tags, key):
-    if not tags:
-        return None
-    val = tags.get(key)
-    if isinstance(val, (list, tuple)):
-        return val[0] if val else None
-    return val
+def _parse_tracks(to_parse: List[Tuple[str, str]], workers: int, chunk_size: int) -> List[Optional[Dict]]:
+    """Parse files with mutagen, fanning chunks out to a process pool when worth it.
+    Results are returned in the same order as `to_parse`."""
+    if workers <= 1 or len(to_parse) <= chunk_size:
+        return read_tracks(to_parse)
 
-def get_local_tracks(local_directory: str) -> List[Dict]:
+    chunks = [to_parse[i:i + chunk_size] for i in range(0, len(to_parse), chunk_size)]
+    workers = min(workers, len(chunks))
+    print(f"Parsing {len(to_parse)} files with {workers} workers ({len(chunks)} chunks of up to {chunk_size})...")
+    results: List[Optional[Dict]] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields chunk results in submission order, so the merge keeps walk order
+        for chunk_result in executor.map(read_tracks, chunks):
+            results.extend(chunk_result)
+    return results
+
+def get_local_tracks(
+        local_directory: str,
+        use_cache: bool = None,
+        listing: List[FileEntry] = None,
+        skipped: List[str] = None
+    ) -> List[Dict]:
     """Recursively collect local music tracks and metadata.
-    Returns a list of dicts containing metadata and a normalized title for similarity."""
+    Returns a list of dicts containing metadata and a normalized title for similarity.
+
+    When the tag cache is enabled (library_scan.cache in config.json), files whose
+    size and mtime did not change since the previous scan are served from the cache
+    instead of being re-opened with mutagen, and the tree is listed through
+    dir_cache.scan_directory (which can skip re-listing unchanged directories).
+    Files that do need parsing are spread over library_scan.workers processes
+    (0 = one per CPU, 1 = serial) in chunks of library_scan.chunk_size files.
+    A `listing` of local_directory already returned by scan_directory is used as is
+    instead of walking the tree again.
+
+    Directories that could not be read are appended to `skipped` (when given; pass the
+    list scan_directory filled along with its `listing`). The downloaded-track ledger is
+    only pruned after a scan that reached every directory."""
     tracks: List[Dict] = []
     if not local_directory:
         return tracks
 
-    for root, _, files in os.walk(local_directory):
-        for fname in files:
+    config = get_config()
+    audio_extensions = config.get("audio_extensions", [])
+    scan_config = config.get("library_scan", {})
+    if use_cache is None:
+        use_cache = scan_config.get("cache", True)
+    workers = scan_config.get("workers", 1)
+    if not workers:
+        workers = os.cpu_count() or 1
+    chunk_size = max(1, scan_config.get("chunk_size", 256))
+
+    if skipped is None:
+        skipped = []
+    complete = os.path.isdir(local_directory)  # an unmounted drive must not look empty
+    cache = TrackCache(local_directory) if use_cache else None
+    with cache or nullcontext():
+        # 1st pass: walk the tree and resolve what we can from the cache.
+        # `entries` keeps walk order; unresolved slots are filled after parsing.
+        entries: List[Optional[Dict]] = []
+        to_parse: List[Tuple[str, str]] = []
+        to_parse_slots: List[Tuple[int, Optional[int], Optional[int]]] = []
+        if listing is not None:
+            files = listing
+        elif cache is not None:
+            files = scan_directory(local_directory, skipped=skipped)
+        else:
+            def on_error(e):
+                print(f"Skipping unreadable directory '{e.filename}': {e}")
+                skipped.append(e.filename)
+
+            files = (
+                (os.path.join(root, fname), fname, None, None)
+                for root, _, fnames in os.walk(local_directory, onerror=on_error)
+                if not is_staging_path(root)
+                for fname in fnames
+            )
+        audio_paths = []
+        for path, fname, size, mtime_ns in files:
             _, ext = os.path.splitext(fname)
-            if ext.lower() not in get_config().get("audio_extensions", []):
-                continue
-            path = os.path.join(root, fname)
-            try:
-                audio = MutagenFile(path, easy=True)
-            except Exception:
-                # skip files that mutagen cannot read
+            if ext.lower() not in audio_extensions:
                 continue
+            audio_paths.append(path)
+
+            if cache is not None:
+                cache.mark_seen(path)
+                cached = cache.get(path, size, mtime_ns)
+                if cached is not None:
+                    entries.append(cached)
+                    continue
+
+            to_parse_slots.append((len(entries), size, mtime_ns))
+            to_parse.append((path, fname))
+            entries.append(None)
 
-            tags = getattr(audio, "tags", None) or {}
-            title = _easy_tag(tags, "title") or os.path.splitext(fname)[0]
-            artist = _easy_tag(tags, "artist")
-            album = _easy_tag(tags, "album")
-            tracknumber = _easy_tag(tags, "tracknumber")
-            discnumber = _easy_tag(tags, "discnumber")
-            date = _easy_tag(tags, "date") or _easy_tag(tags, "year") or _easy_tag(tags, "originaldate")
-            genre = _easy_tag(tags, "genre")
-            albumartist = _easy_tag(tags, "albumartist")
-            composer = _easy_tag(tags, "composer")
-            comment = _easy_tag(tags, "comment")
-
-            duration = None
-            try:
-                info = getattr(audio, "info", None)
-                if info is not None and getattr(info, "length", None) is not None:
-                    duration = float(info.length)
-            except Exception:
-                duration = None
-
-            normalized_title = normalize_title_for_similarity(title)
-
-            track_info = {
-                "path": path,
-                "filename": fname,
-                "title": title,
-                "artist": artist,
-                "album": album,
-                "track_number": tracknumber,
-                "track": tracknumber.split('/')[0] if tracknumber else None,
-                "total_tracks": tracknumber.split('/')[1] if tracknumber and '/' in tracknumber else None,
-                "disc_number": discnumber,
-                "date": date,
-                "genre": genre,
-                "album_artist": albumartist,
-                "composer": composer,
-                "comment": comment,
-                "duration": duration,
-                "duration_ms": int(duration * 1000) if duration else None,
-                "normalized_title": normalized_title,
-                "source": "Local",
-                "provider_id": None,
-                # keep raw tags for any additional metadata consumers may want
-                "raw_tags": dict(tags) if tags else {},
-            }
-            tracks.append(track_info)
+        # 2nd pass: parse cache misses (possibly in parallel) and store them
+        parsed = _parse_tracks(to_parse, workers, chunk_size)
+        for (slot, size, mtime_ns), (path, _), track_info in zip(to_parse_slots, to_parse, parsed):
+            entries[slot] = track_info
+            if cache is not None:
+                cache.put(path, size, mtime_ns, track_info or {})
+
+        tracks = [track_info for track_info in entries if track_info]
+
+        if complete and not skipped:
+            # the scan is complete: forget downloads whose file is gone
+            prune_ledger(local_directory, audio_paths)
+        elif skipped:
+            print(f"{len(skipped)} directories below '{local_directory}' could not be read, "
+                  f"their tracks are missing from this scan and the download ledger was left as is")
+
+    if cache is not None:
+        print(f"Scanned {len(tracks)} local tracks in '{local_directory}' ({cache.hits} cached, {cache.misses} parsed)")
 
     return tracks
 
 
-def get_missing(tracks: List[Dict], local_directory: str) -> List[Dict]:
+def get_missing(tracks: List[Dict], local_directory: str, library=None) -> List[Dict]:
     """Return list of remote tracks that are not present in local_directory.
 
     Matching is done by normalizing "title + first artist" and comparing against
     local tracks' normalized_title. If duration_ms is available for the remote
     track, a match requires a local duration within 2000 ms tolerance when local
     duration is present.
+
+    If a running LocalLibrary covering local_directory is passed, its live index
+    is queried instead of scanning the directory.
     """
-    local_tracks = get_local_tracks(local_directory)
+    is_missing = missing_checker(local_directory, library)
+    return [t for t in tracks if is_missing(t)]
+
+def missing_checker(local_directory: str, library=None) -> Callable[[Dict], bool]:
+    """Index the local tracks once and return a function telling whether a remote
+    track is missing from local_directory (same rules as get_missing), so tracks
+    can be checked one at a time as they stream in."""
+    if library is not None and library.covers(local_directory):
+        local_tracks = library.tracks(local_directory)
+    else:
+        local_tracks = get_local_tracks(local_directory)
     
-    missing = []
-    for t in tracks:
-        found = False
-        for lt in local_tracks:
-            if is_match(lt, t):
-                found = True
-                break
-
-        if not found:
-            missing.append(t)
-
-    return missing
+    # exact ISRC join first, only the leftovers go through fuzzy matching
+    use_isrc = get_config().get("matching", {}).get("isrc", True)
+    local_isrcs = {lt["isrc"] for lt in local_tracks if lt.get("isrc")} if use_isrc else set()
+
+    # only compare against local tracks within duration tolerance (is_match rejects the rest anyway),
+    # optionally narrowed down to the closest titles (matching.title_candidates)
+    index = TitleIndex(local_tracks)
+
+    def is_missing(t: Dict) -> bool:
+        if t.get("isrc") and t["isrc"] in local_isrcs:
+            return False
+        return not any(is_match(lt, t) for lt in index.candidates(t))
+
+    return is_missing
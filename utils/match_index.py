@@ -0,0 +1,117 @@
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List
+from .compare import DURATION_TOLERANCE_MS
+from .config import get_config
+from .normalize import normalize_title_for_similarity
+
+
+class DurationIndex:
+    """Tracks bucketed by duration_ms, used to find match candidates without
+    comparing against every track.
+
+    Buckets are `tolerance_ms` wide, so every track within tolerance of a query
+    lives in the query's bucket or one of its two neighbours. Tracks without a
+    duration are not indexed: duration_close() never accepts them anyway.
+    """
+
+    def __init__(self, tracks: Iterable[Dict] = (), tolerance_ms: int = DURATION_TOLERANCE_MS):
+        self.tolerance_ms = max(1, tolerance_ms)
+        self._buckets: Dict[int, List[Dict]] = defaultdict(list)
+        for t in tracks:
+            self.add(t)
+
+    def add(self, track: Dict):
+        duration = track.get("duration_ms")
+        if not duration:
+            return
+        self._buckets[int(duration // self.tolerance_ms)].append(track)
+
+    def candidates(self, track: Dict) -> List[Dict]:
+        """Return indexed tracks whose duration is within tolerance of `track`."""
+        duration = track.get("duration_ms")
+        if not duration:
+            return []
+        key = int(duration // self.tolerance_ms)
+        return [
+            t
+            for k in (key - 1, key, key + 1)
+            for t in self._buckets.get(k, ())
+            if abs(t["duration_ms"] - duration) <= self.tolerance_ms
+        ]
+
+
+def _title_trigrams(track: Dict) -> set:
+    """Character trigrams of both the normalized and the raw lowercase title,
+    mirroring the two comparisons title_similarity blends."""
+    title = track.get("title", "") or ""
+    normalized = track.get("normalized_title") or normalize_title_for_similarity(title, track.get("source"))
+    grams = set()
+    for text in (normalized.lower(), title.lower()):
+        padded = f"  {text} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex(DurationIndex):
+    """Duration-bucketed inverted index of title trigrams.
+
+    Postings are keyed by (duration bucket, trigram), so a lookup only touches
+    titles that can pass duration_close(). Candidates are ranked by trigram
+    overlap (Dice coefficient) and the best `max_candidates` are returned for
+    the expensive SequenceMatcher scoring.
+
+    `max_candidates` is the recall knob (matching.title_candidates in config.json):
+    0 disables the title filter and returns every track within duration tolerance,
+    which gives exactly the exhaustive results.
+    """
+
+    def __init__(self, tracks: Iterable[Dict] = (), max_candidates: int = None, tolerance_ms: int = DURATION_TOLERANCE_MS):
+        if max_candidates is None:
+            max_candidates = get_config().get("matching", {}).get("title_candidates", 0)
+        self.max_candidates = max_candidates
+        self._tracks: List[Dict] = []
+        self._gram_counts: List[int] = []
+        self._postings: Dict[tuple, List[int]] = defaultdict(list)
+        super().__init__(tracks, tolerance_ms)
+
+    def add(self, track: Dict):
+        super().add(track)
+        duration = track.get("duration_ms")
+        if not duration or self.max_candidates <= 0:
+            return
+        key = int(duration // self.tolerance_ms)
+        pos = len(self._tracks)
+        grams = _title_trigrams(track)
+        self._tracks.append(track)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._postings[(key, gram)].append(pos)
+
+    def candidates(self, track: Dict, accept: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Return likely matches for `track`, best first. `accept` filters tracks out
+        before ranking (e.g. to ignore tracks from the same source)."""
+        if self.max_candidates <= 0:
+            found = super().candidates(track)
+            return [t for t in found if accept(t)] if accept else found
+
+        duration = track.get("duration_ms")
+        if not duration:
+            return []
+        key = int(duration // self.tolerance_ms)
+        grams = _title_trigrams(track)
+        shared: Dict[int, int] = defaultdict(int)
+        for k in (key - 1, key, key + 1):
+            for gram in grams:
+                for pos in self._postings.get((k, gram), ()):
+                    shared[pos] += 1
+
+        scored = []
+        for pos, count in shared.items():
+            t = self._tracks[pos]
+            if abs(t["duration_ms"] - duration) > self.tolerance_ms:
+                continue
+            if accept and not accept(t):
+                continue
+            scored.append((-2 * count / (len(grams) + self._gram_counts[pos]), pos))
+        scored.sort()
+        return [self._tracks[pos] for _, pos in scored[:self.max_candidates]]
@@ -1,14 +1,37 @@
 import re # i hate this
 import unicodedata
+from functools import lru_cache
 
+# Size of the LRU cache behind normalize_title_for_similarity, keyed by (title, source)
+NORMALIZE_CACHE_SIZE = 65536
+
+_ISRC_JUNK_RE = re.compile(r"[^A-Za-z0-9]")
+_FEAT_RE = re.compile(r"\b(feat|ft|featuring)\.?\b[^-—\(\\\[]*")
+_EMPTY_PARENS_RE = re.compile(r"\(\s*\)")
+_PLUS_RE = re.compile(r"\+\s*")
+_PUNCTUATION_RE = re.compile(r"[^a-z0-9\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_isrc(isrc) -> str:
+    """Normalize an ISRC for exact joins: uppercase, without dashes/spaces. Returns None if empty."""
+    if not isrc or not isinstance(isrc, str):
+        return None
+    isrc = _ISRC_JUNK_RE.sub("", isrc).upper()
+    return isrc or None
 
 def normalize_title_for_similarity(title: str, source: str=None) -> str:
-    """Normalize title for similarity checks: remove accents, 'feat.', content after last '(', punctuation, lowercase."""
+    """Normalize title for similarity checks: remove accents, 'feat.', content after last '(', punctuation, lowercase.
+    Results are memoized in a bounded LRU cache, the same titles get compared over and over while matching."""
+    return _normalize_title(title, source)
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_title(title: str, source: str=None) -> str:
     title_backup = title
     title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("utf-8").lower()
     
     # Remove common feat markers
-    title = re.sub(r"\b(feat|ft|featuring)\.?\b[^-—\(\\\[]*", "", title)
+    title = _FEAT_RE.sub("", title)
     
     # Remove everything after the last '+' or '(' (as often used for producers) if source is SoundCloud (most common there)
     #   processing parentheses first to avoid issues if both are present
@@ -20,7 +43,7 @@ def normalize_title_for_similarity(title: str, source: str=None) -> str:
             if title.find(')', last_paren) != -1:
                 title = title[:last_paren]
                 # Remove any leftover empty parentheses
-                title = re.sub(r"\(\s*\)", "", title)
+                title = _EMPTY_PARENS_RE.sub("", title)
         
         last_plus = title.rfind('+')
         if last_plus != -1:
@@ -28,11 +51,11 @@ def normalize_title_for_similarity(title: str, source: str=None) -> str:
             if title[last_plus + 1:].strip():
                 title = title[:last_plus]
                 # Remove any leftover plus signs and surrounding whitespace
-                title = re.sub(r"\+\s*", "", title)
+                title = _PLUS_RE.sub("", title)
     
     # Simplify punctuation: keep letters, numbers and spaces
-    title = re.sub(r"[^a-z0-9\s]", "", title)
-    title_final = re.sub(r"\s+", " ", title).strip().upper()
+    title = _PUNCTUATION_RE.sub("", title)
+    title_final = _WHITESPACE_RE.sub(" ", title).strip().upper()
     
     # print(f"Normalized title for similarity: '{title_backup}' -> '{title_final}' || source={source}")
     return title_final
@@ -46,4 +69,15 @@ if __name__ == "__main__":
         norm = normalize_title_for_similarity(t, source="SoundCloud")
         print(f"Original: '{t}'")
         print(f"  For Similarity: '{norm}'")
-        print()
\ No newline at end of file
+        print()
+
+    # Micro-benchmark: a get_missing run normalizes the same few titles over and over
+    import timeit
+    titles = [f"Track {i} (feat. Someone) [Remix] + prod. {i % 7}" for i in range(500)]
+    def run(normalize):
+        for _ in range(20):
+            for t in titles:
+                normalize(t, "Soundcloud")
+    uncached = timeit.timeit(lambda: run(_normalize_title.__wrapped__), number=1)
+    cached = timeit.timeit(lambda: run(normalize_title_for_similarity), number=1)
+    print(f"{len(titles) * 20} calls: uncached {uncached * 1000:.1f} ms, cached {cached * 1000:.1f} ms ({uncached / cached:.1f}x)")
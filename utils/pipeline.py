@@ -0,0 +1,102 @@
+import time
+import threading
+from functools import partial
+from typing import Callable, Dict, List, Optional
+from .config import get_config
+from .download import DownloadExecutor
+from .search.get_artist_library import iter_artist_library
+
+
+def pipeline_enabled() -> bool:
+    return get_config().get("pipeline", {}).get("enabled", False)
+
+def run_pipeline(
+        artist_name: str = None,
+        artist_url: str = None,
+        on_queued: Optional[Callable[[Dict], None]] = None,
+        on_downloaded: Optional[Callable[[Dict], None]] = None,
+        journal=None,
+        **kwargs
+    ) -> List[Dict]:
+    """Fetch, match and download an artist's missing tracks as overlapping stages.
+
+    Instead of fetching everything, computing the missing list and only then downloading,
+    every confirmed-missing track goes straight to the download stage while the provider
+    threads keep fetching and this thread keeps matching:
+
+        provider threads -> [fetched batches] -> merge + missing check -> [downloads] -> DownloadExecutor
+
+    Both queues are bounded (pipeline.queue_size in config.json), so a slow download stage
+    holds matching back, which in turn holds the fetchers back. iter_artist_library only
+    confirms a lower priority track once every higher priority provider has finished, so
+    a priority winner can never show up after its duplicate was queued.
+
+    on_queued(track) is called when a track is handed to the download stage, on_downloaded(track)
+    from a download thread once download_song returned for it.
+    With a DownloadJournal, queued tracks are planned in it and their progress recorded.
+    Extra keyword arguments are passed on to iter_artist_library.
+    Returns the tracks whose download produced files, in completion order.
+    """
+    queue_size = get_config().get("pipeline", {}).get("queue_size", 16)
+    downloaded = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def on_done(track, future):
+        if future.exception() is not None:
+            # one failed download must not stall the pipeline
+            print(f"Error downloading '{track.get('title')}': {future.exception()}")
+            return
+        if future.result():
+            with lock:
+                downloaded.append(track)
+        if on_downloaded:
+            on_downloaded(track)
+
+    queued = 0
+    # submit() blocks while queue_size downloads are pending, holding matching (and the fetchers) back
+    with DownloadExecutor(max_pending=queue_size, journal=journal) as executor:
+        # Providers stream an album's tracks one after the other, so each source's current album
+        # is held back until it is complete or the next album starts, then goes through
+        # submit_all to be downloaded as a whole when enough of it is missing.
+        open_albums: Dict[str, List[Dict]] = {}
+
+        def submit(tracks):
+            for track, future in zip(tracks, executor.submit_all(tracks)):
+                future.add_done_callback(partial(on_done, track))
+
+        def flush(source):
+            album = open_albums.pop(source, None)
+            if album:
+                submit(album)
+
+        kwargs["include_only_missing"] = True
+        for track in iter_artist_library(artist_name, artist_url, queue_size=queue_size, **kwargs):
+            if journal and not journal.should_download(track):
+                continue  # done, in flight, or waiting out its retry backoff
+            if queued == 0:
+                print(f"First missing track confirmed after {time.perf_counter() - start:.2f}s")
+            queued += 1
+            if journal:
+                journal.plan([track], artist_name or artist_url)
+            if on_queued:
+                on_queued(track)
+            print(f"- Queued {track.get('title')} ({track.get('source')})")
+
+            source = track.get("source")
+            album = open_albums.get(source)
+            if album and album[0].get("album_url") != track.get("album_url"):
+                flush(source)
+            if not track.get("album_url"):
+                submit([track])
+                continue
+            album = open_albums.setdefault(source, [])
+            album.append(track)
+            if len(album) >= (track.get("album_track_count") or 0):
+                flush(source)
+
+        for source in list(open_albums):
+            flush(source)
+
+    print(f"Pipeline done in {time.perf_counter() - start:.2f}s: {len(downloaded)}/{queued} missing tracks downloaded")
+    return downloaded
@@ -1,13 +1,55 @@
-import requests
+import json
+import time
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from ..cache import open_cache_db
+from ..config import get_config
+from ..normalize import normalize_isrc, normalize_title_for_similarity
+from .http import PooledClient, RateLimiter
+
+DEEZER_CONFIG = get_config().get("deezer", {})
+DEEZER_WORKERS = DEEZER_CONFIG.get("workers", 8)
+
+# One connection pool shared by every Deezer call (and worker thread), throttled to
+# Deezer's documented quota of 50 requests per 5 seconds
+_session = PooledClient(pool_size=DEEZER_WORKERS)
+_rate_limiter = RateLimiter(
+    DEEZER_CONFIG.get("rate_limit_calls", 50),
+    DEEZER_CONFIG.get("rate_limit_period", 5)
+)
+
+def _deezer_get(url: str, max_retries: int = 5) -> dict:
+    """GET a Deezer API url through the shared session and rate limiter, returning the JSON body.
+    Retries when Deezer still answers with its quota error (code 4)."""
+    for attempt in range(max_retries + 1):
+        _rate_limiter.acquire()
+        body = _session.get(url, timeout=10).json()
+        error = body.get("error") if isinstance(body, dict) else None
+        if not (isinstance(error, dict) and error.get("code") == 4 and attempt < max_retries):
+            return body
+        time.sleep(_rate_limiter.period)
+
+def _get_album_tracks(album_id: int) -> list[dict]:
+    """Every track of an album, following the listing's pagination."""
+    url = f"https://api.deezer.com/album/{album_id}/tracks?limit=100"
+    listing = []
+    while url:
+        page = _deezer_get(url)
+        listing.extend(page.get("data", []))
+        url = page.get("next")
+    return listing
 
 def get_deezer_artist_id(name: str):
     print(f"Searching Deezer for artist '{name}'...")
-    r = requests.get(f"https://api.deezer.com/search/artist?q={name}")
-    data = r.json()
+    data = _deezer_get(f"https://api.deezer.com/search/artist?q={quote(name)}")
     return data["data"][0]["id"] if data["data"] else None
 
 def get_deezer_discography(artist_id: int, include_feats=False, include_full_album_if_featured=False) -> list[dict]:
+    return [t for batch in iter_deezer_discography(artist_id, include_feats, include_full_album_if_featured) for t in batch]
+
+def iter_deezer_discography(artist_id: int, include_feats=False, include_full_album_if_featured=False):
+    """Streaming variant of get_deezer_discography: yields the track dicts album by album,
+    as soon as each album listing (and its contributors, when needed) has been fetched."""
     print(f"Fetching Deezer discography for artist ID '{artist_id}'...")
     albums = []
 
@@ -15,8 +57,7 @@ def get_deezer_discography(artist_id: int, include_feats=False, include_full_alb
     url = f"https://api.deezer.com/artist/{artist_id}/top?limit=100"
     tracks_found = []
     while url:
-        r = requests.get(url)
-        page = r.json()
+        page = _deezer_get(url)
         tracks_found.extend(page.get("data", []))
         url = page.get("next")
 
@@ -37,58 +78,118 @@ def get_deezer_discography(artist_id: int, include_feats=False, include_full_alb
         }
 
     albums = list(album_map.values())
-    album_ids = list(album_map.keys())
 
     data = {"tracks_found": len(tracks_found), "albums_collected": len(albums)}
     print(data)
-    
-    tracks = []
+
     seen = set()
-    
-    for album in albums:
-        ar = requests.get(f"https://api.deezer.com/album/{album['id']}/tracks")
-        for t in ar.json().get("data", []):
-            # deezer track id uniqueness
-            if t.get("id") and t["id"] in seen:
-                continue
-            
-            track = requests.get(f"https://api.deezer.com/track/{t['id']}").json()
-            
-            # skip if not main artist and not including feats/full album
-            artists = track.get("contributors") or []
-            artists_ids = [t_artist.get("id") for t_artist in track.get("contributors", []) if t_artist.get("id")]
-            
-            main_artist_id = None
-            if artists and isinstance(artists[0], dict):
-                main_artist_id = artists[0].get("id")
-                
-            if main_artist_id != artist_id: # if not main artist
-                if include_feats == False:
+
+    # album listings are fetched concurrently, map() hands them back in album order
+    with ThreadPoolExecutor(max_workers=DEEZER_WORKERS) as executor:
+        for album, listing in zip(albums, executor.map(_get_album_tracks, [a["id"] for a in albums])):
+            # album track listings only carry the main artist: /track/{id} (for contributors) is only
+            # requested for featuring tracks, and only when full albums are not included
+            # (main-artist tracks are always kept, and otherwise include_feats alone decides)
+            needs_contributors = []
+            if include_feats and not include_full_album_if_featured:
+                needs_contributors = [
+                    t["id"]
+                    for t in listing
+                    if t.get("id") and (t.get("artist") or {}).get("id") != artist_id
+                ]
+            contributors = _get_track_contributors(needs_contributors)
+
+            tracks = []
+            for t in listing:
+                # deezer track id uniqueness
+                if t.get("id") and t["id"] in seen:
                     continue
-                else:
-                    if artist_id not in artists_ids:
-                        if include_full_album_if_featured == False:
-                            # artist not in contributors for this track, and we're not including full album -> skip
-                            continue
+
+                # skip if not main artist and not including feats/full album
+                main_artist_id = (t.get("artist") or {}).get("id")
+
+                if main_artist_id != artist_id: # if not main artist
+                    if include_feats == False:
+                        continue
                     else:
-                        pass  # include full album
-            
-            seen.add(t.get("id"))
-            tracks.append({
-                "title": t["title"],
-                "album": album.get("title"),
-                "artists": [t["artist"]["name"]] if t.get("artist") else [],
-                "track_number": t.get("track_position"),
-                "disc_number": t.get("disk_number"),
-                "duration": t.get("duration", None),             # Deezer duration is in seconds
-                "duration_ms": int(t.get("duration")) * 1000 if t.get("duration") is not None else None,  # convert seconds -> ms
-                "uri": t.get("isrc"),
-                "url": t.get("link"),
-                "source": "Deezer",
-                "provider_id": str(t.get("id")),                 # deezer track id (string for uniformity)
-            })
-    return tracks
+                        if artist_id not in contributors.get(t.get("id"), []):
+                            if include_full_album_if_featured == False:
+                                # artist not in contributors for this track, and we're not including full album -> skip
+                                continue
+                        else:
+                            pass  # include full album
+
+                seen.add(t.get("id"))
+                tracks.append({
+                    "title": t["title"],
+                    "normalized_title": normalize_title_for_similarity(t["title"], "Deezer"),
+                    "album": album.get("title"),
+                    "album_url": f"https://www.deezer.com/album/{album['id']}",  # lets the downloader fetch a whole album at once
+                    "album_track_count": len(listing),
+                    "artists": [t["artist"]["name"]] if t.get("artist") else [],
+                    "track_number": t.get("track_position"),
+                    "disc_number": t.get("disk_number"),
+                    "duration": t.get("duration", None),             # Deezer duration is in seconds
+                    "duration_ms": int(t.get("duration")) * 1000 if t.get("duration") is not None else None,  # convert seconds -> ms
+                    "uri": t.get("isrc"),
+                    "isrc": normalize_isrc(t.get("isrc")),
+                    "url": t.get("link"),
+                    "source": "Deezer",
+                    "provider_id": str(t.get("id")),                 # deezer track id (string for uniformity)
+                })
+            if tracks:
+                yield tracks
+
+    print(f"Deezer connections: {_session.stats()}")
+
+def _fetch_track_contributors(track_id: int):
+    """Return the contributor artist IDs of a track, or None if Deezer returned an error."""
+    track = _deezer_get(f"https://api.deezer.com/track/{track_id}")
+    if "error" in track:
+        return None
+    return [a.get("id") for a in track.get("contributors") or [] if a.get("id")]
+
+def _get_track_contributors(track_ids: list[int]) -> dict[int, list[int]]:
+    """Contributor artist IDs for each track. Served from the on-disk cache when fresh,
+    the remaining tracks are fetched concurrently (deezer.workers threads)."""
+    if not track_ids:
+        return {}
+    max_age = DEEZER_CONFIG.get("track_cache_days", 30) * 24 * 3600
+    track_ids = list(dict.fromkeys(track_ids))
+
+    conn = open_cache_db("deezer")
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS track_contributors ("
+            " track_id INTEGER PRIMARY KEY,"
+            " contributors TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        contributors = {}
+        for i in range(0, len(track_ids), 500):
+            chunk = track_ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT track_id, contributors FROM track_contributors"
+                f" WHERE fetched_at > ? AND track_id IN ({','.join('?' * len(chunk))})",
+                [time.time() - max_age, *chunk]
+            )
+            for track_id, data in rows:
+                contributors[track_id] = json.loads(data)
 
+        to_fetch = [tid for tid in track_ids if tid not in contributors]
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=DEEZER_WORKERS) as executor:
+                fetched = list(zip(to_fetch, executor.map(_fetch_track_contributors, to_fetch)))
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO track_contributors (track_id, contributors, fetched_at) VALUES (?, ?, ?)",
+                    [(tid, json.dumps(ids), time.time()) for tid, ids in fetched if ids is not None]
+                )
+            contributors.update((tid, ids or []) for tid, ids in fetched)
+        print(f"Deezer contributors: {len(track_ids) - len(to_fetch)} cached, {len(to_fetch)} fetched")
+    finally:
+        conn.close()
+    return contributors
 
 if __name__ == "__main__":
     result = get_deezer_discography(input("Enter artist name: "))
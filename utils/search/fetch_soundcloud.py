@@ -3,18 +3,41 @@ import time
 import random
 import base64
 from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from .http import PooledClient
 from utils.config import config
+from utils.token_store import token_lock, load_token, save_token
+from utils.normalize import normalize_isrc, normalize_title_for_similarity
 
-# Simple in-memory token cache keyed by client_id. Stores dicts with keys:
+# In-memory token cache keyed by client_id, backed by the on-disk token store
+# (utils.token_store) so other processes and later runs reuse the token. Stores dicts with keys:
 # - access_token (str)
 # - expires_at (float, epoch seconds)
 _TOKEN_CACHE: Dict[str, Dict[str, Any]] = {}
 
 CLIENT_ID = config.get("api", {}).get("soundcloud", {}).get("CLIENT_ID")
 CLIENT_SECRET = config.get("api", {}).get("soundcloud", {}).get("CLIENT_SECRET")
+SOUNDCLOUD_CONFIG = config.get("soundcloud", {})
+
+# Keep-alive connections shared by every SoundCloud request (token, pages, playlist workers)
+_client = PooledClient(pool_size=SOUNDCLOUD_CONFIG.get("workers", 4))
+
+def _token_key(client_id: str) -> str:
+    return f"soundcloud:{client_id}"
 
 def soundcloud_authenticate(client_id: str, client_secret: str) -> Dict[str, Any]:
-    """Obtain a new access token from SoundCloud using client credentials OAuth 2.1 flow.
+    """Obtain a new access token from SoundCloud and store it (memory + on-disk token store).
+
+    Returns a dict with 'access_token' and 'expires_at' (epoch seconds).
+    """
+    with token_lock():
+        token_info = _request_token(client_id, client_secret)
+        save_token(_token_key(client_id), token_info)
+    _TOKEN_CACHE[client_id] = token_info
+    return token_info
+
+def _request_token(client_id: str, client_secret: str) -> Dict[str, Any]:
+    """Request a new access token using client credentials OAuth 2.1 flow.
 
     Uses the secure endpoint and Basic authentication with Base64-encoded credentials.
     
@@ -36,7 +59,7 @@ def soundcloud_authenticate(client_id: str, client_secret: str) -> Dict[str, Any
         "grant_type": "client_credentials",
     }
 
-    resp = requests.post(token_url, headers=headers, data=data, timeout=10)
+    resp = _client.post(token_url, headers=headers, data=data, timeout=10)
     resp.raise_for_status()
     body = resp.json()
     access_token = body.get("access_token")
@@ -53,10 +76,7 @@ def soundcloud_authenticate(client_id: str, client_secret: str) -> Dict[str, Any
         # If expires_in missing or small, set a conservative expiry of 5 minutes
         expires_at = time.time() + 300
 
-    token_info = {"access_token": access_token, "expires_at": expires_at}
-    # Cache by client_id
-    _TOKEN_CACHE[client_id] = token_info
-    return token_info
+    return {"access_token": access_token, "expires_at": expires_at}
 
 
 def _get_cached_token(client_id: str, client_secret: str) -> str:
@@ -65,8 +85,15 @@ def _get_cached_token(client_id: str, client_secret: str) -> str:
     if token_info and token_info.get("expires_at", 0) > time.time():
         return token_info["access_token"]
 
-    # Not cached or expired -> fetch new
-    token_info = soundcloud_authenticate(client_id, client_secret)
+    # Not in memory: reuse a token stored by a previous run / another process,
+    # the lock makes concurrent processes wait for one token request instead of each issuing one
+    with token_lock():
+        token_info = load_token(_token_key(client_id))
+        if token_info is None:
+            # Not cached or expired -> fetch new
+            token_info = _request_token(client_id, client_secret)
+            save_token(_token_key(client_id), token_info)
+    _TOKEN_CACHE[client_id] = token_info
     return token_info["access_token"]
 
 
@@ -98,7 +125,7 @@ def _request_with_retry(method: str,
         headers = {**headers, **_build_auth_headers(access_token)}
 
         try:
-            resp = requests.request(method, url, headers=headers, timeout=10, **kwargs)
+            resp = _client.request(method, url, headers=headers, timeout=10, **kwargs)
         except requests.RequestException:
             # Network error: if attempts left, backoff and retry
             if attempt <= max_retries:
@@ -170,6 +197,11 @@ def get_soundcloud_artist_permalink(username: str) -> int:
         return user["permalink"]
     
 def get_soundcloud_discography(artist_permalink: int, include_feats=False, include_full_album_if_featured=False) -> list[dict]:
+    return [t for batch in iter_soundcloud_discography(artist_permalink, include_feats, include_full_album_if_featured) for t in batch]
+
+def iter_soundcloud_discography(artist_permalink: int, include_feats=False, include_full_album_if_featured=False):
+    """Streaming variant of get_soundcloud_discography: yields the track dicts page by page.
+    Playlists are fetched first so every yielded track already carries its album title."""
     print(f"Fetching SoundCloud discography for artist '{artist_permalink}'...")
     
     # Step 1 & 2: Resolve permalink to user info using request wrapper
@@ -183,9 +215,57 @@ def get_soundcloud_discography(artist_permalink: int, include_feats=False, inclu
     if not user_id:
         raise RuntimeError(f"Failed to find user '{artist_permalink}' on SoundCloud.")
 
-    # Step 3: Fetch all tracks by user ID (paginated)
+    # Step 3: get the album name of each track from the user's playlists
+    playlists_url = f"https://api.soundcloud.com/users/{user_id}/playlists"
+    playlists = []
+    limit = 200  # Max allowed per page
+
+    next_url = playlists_url
+    # without show_tracks every playlist page is much smaller, track IDs are then fetched per playlist
+    show_tracks = SOUNDCLOUD_CONFIG.get("playlist_show_tracks", True)
+    params = {"limit": limit, "linked_partitioning": True, "access": "playable", "show_tracks": show_tracks}
+
+    while next_url:
+        # Send params only on the first request; subsequent pages are followed via next_href.
+        if next_url == playlists_url:
+            playlist_response = _request_with_retry("GET", next_url, CLIENT_ID, CLIENT_SECRET, params=params)
+        else:
+            playlist_response = _request_with_retry("GET", next_url, CLIENT_ID, CLIENT_SECRET)
+
+        data = playlist_response.json()
+
+        # Paginated response with 'collection' and 'next_href'
+        if isinstance(data, dict) and "collection" in data:
+            page_playlists = data["collection"]
+            playlists.extend(page_playlists)
+            next_url = data.get("next_href")
+        # Fallback: API returned a plain list
+        elif isinstance(data, list):
+            playlists.extend(data)
+            # If page is smaller than the limit, we are done; otherwise stop to avoid infinite loop.
+            if len(data) < limit:
+                break
+            break
+        else:
+            break
+    
+    if not show_tracks:
+        with ThreadPoolExecutor(max_workers=SOUNDCLOUD_CONFIG.get("workers", 4)) as executor:
+            playlist_tracks = executor.map(_get_playlist_tracks, playlists)
+            for playlist, ptracks in zip(playlists, playlist_tracks):
+                playlist["tracks"] = ptracks
+
+    # Assign albums from playlists to tracks: build track id -> playlist in one pass.
+    # Later playlists overwrite earlier ones, untitled playlists never do.
+    album_playlists = {}
+    for playlist in playlists:
+        if not playlist.get("title"):
+            continue
+        for playlisttrack in playlist.get("tracks") or []:
+            album_playlists[str(playlisttrack.get("id"))] = playlist
+
+    # Step 4: Fetch all tracks by user ID (paginated), yielding each page
     tracks_url = f"https://api.soundcloud.com/users/{user_id}/tracks"
-    tracks = []
     limit = 200  # Max allowed per page
 
     # Use SoundCloud's linked_partitioning pagination: responses include 'collection' and 'next_href'.
@@ -205,7 +285,6 @@ def get_soundcloud_discography(artist_permalink: int, include_feats=False, inclu
             if not isinstance(t, dict):
                 return None
             title = t.get("title")
-            album = t.get("title") # fallback to title as album, album is fetched later
             # Collect artists from several possible fields
             artists = []
             uploader = t.get("user", {}).get("username")
@@ -234,16 +313,21 @@ def get_soundcloud_discography(artist_permalink: int, include_feats=False, inclu
                     artists_clean.append(a)
             provider_id = str(t.get("id")) if t.get("id") is not None else None
             duration_ms = t.get("duration", None)  # SoundCloud duration is in ms
+            playlist = album_playlists.get(provider_id) or {}
             
             return {
                 "title": title,
-                "album": album,
+                "normalized_title": normalize_title_for_similarity(title or "", "Soundcloud"),
+                "album": playlist.get("title") or title,  # playlist title, falling back to the track title
+                "album_url": playlist.get("permalink_url"),  # lets the downloader fetch a whole playlist at once
+                "album_track_count": len(playlist["tracks"]) if playlist else None,
                 "artists": artists_clean,
                 "track_number": None, # TODO: SoundCloud does not provide track number directly but could be inferred from playlists
                 "disc_number": None,
                 "duration": duration_ms/1000 if duration_ms else None,
                 "duration_ms": duration_ms,
                 "uri": t.get("urn"),
+                "isrc": normalize_isrc(t.get("isrc") or (t.get("publisher_metadata") or {}).get("isrc")),
                 "url": t.get("permalink_url"),
                 "provider_id": provider_id,
                 "source": "Soundcloud",
@@ -253,66 +337,41 @@ def get_soundcloud_discography(artist_permalink: int, include_feats=False, inclu
         if isinstance(data, dict) and "collection" in data:
             page_tracks = data["collection"]
             print(f"Fetched {len(page_tracks)} tracks from SoundCloud page.")
-            for t in page_tracks:
-                obj = build_track_obj(t)
-                if obj:
-                    tracks.append(obj)
+            tracks = [obj for obj in map(build_track_obj, page_tracks) if obj]
+            if tracks:
+                yield tracks
             next_url = data.get("next_href")
         # Fallback: API returned a plain list (older/alternate behavior)
         elif isinstance(data, list):
             page_tracks = data
             print(f"Fetched {len(page_tracks)} tracks from SoundCloud page.")
-            for t in page_tracks:
-                obj = build_track_obj(t)
-                if obj:
-                    tracks.append(obj)
+            tracks = [obj for obj in map(build_track_obj, page_tracks) if obj]
+            if tracks:
+                yield tracks
             # If page is smaller than the limit, we are done; otherwise stop to avoid infinite loop.
             if len(page_tracks) < limit:
                 break
             break
         else:
             break
-    
-    # Step 4: get album name for each track if missing
-    playlists_url = f"https://api.soundcloud.com/users/{user_id}/playlists"
-    playlists = []
-    limit = 200  # Max allowed per page
-
-    next_url = playlists_url
-    params = {"limit": limit, "linked_partitioning": True, "access": "playable", "show_tracks": True}
-
-    while next_url:
-        # Send params only on the first request; subsequent pages are followed via next_href.
-        if next_url == playlists_url:
-            playlist_response = _request_with_retry("GET", next_url, CLIENT_ID, CLIENT_SECRET, params=params)
-        else:
-            playlist_response = _request_with_retry("GET", next_url, CLIENT_ID, CLIENT_SECRET)
 
-        data = playlist_response.json()
-
-        # Paginated response with 'collection' and 'next_href'
+    print(f"SoundCloud connections: {_client.stats()}")
+
+def _get_playlist_tracks(playlist: dict) -> list:
+    """Fetch the track list of a playlist (paginated), used when playlists are paged without show_tracks."""
+    playlist_id = playlist.get("urn") or playlist.get("id")
+    url = f"https://api.soundcloud.com/playlists/{playlist_id}/tracks"
+    params = {"limit": 200, "linked_partitioning": True, "access": "playable"}
+    ptracks = []
+    while url:
+        data = _request_with_retry("GET", url, CLIENT_ID, CLIENT_SECRET, params=params).json()
+        params = None  # next_href already carries the query
         if isinstance(data, dict) and "collection" in data:
-            page_playlists = data["collection"]
-            playlists.extend(page_playlists)
-            next_url = data.get("next_href")
-        # Fallback: API returned a plain list
+            ptracks.extend(data["collection"])
+            url = data.get("next_href")
         elif isinstance(data, list):
-            playlists.extend(data)
-            # If page is smaller than the limit, we are done; otherwise stop to avoid infinite loop.
-            if len(data) < limit:
-                break
+            ptracks.extend(data)
             break
         else:
             break
-    
-    # Assign album titles from playlists to tracks
-    for track in tracks:
-        for playlist in playlists:
-            for playlisttrack in playlist.get("tracks", []):
-                if str(playlisttrack.get("id")) == track.get("provider_id"):
-                    album_title = playlist.get("title")
-                    if album_title:
-                        track["album"] = album_title
-                    break
-        
-    return tracks
+    return ptracks
@@ -1,10 +1,50 @@
-from ..config import config
+import time
+from ..config import config, get_config
+from ..normalize import normalize_isrc, normalize_title_for_similarity
+from ..token_store import token_lock, load_token, save_token
 from spotipy import Spotify
+from spotipy.cache_handler import CacheHandler
 from spotipy.oauth2 import SpotifyClientCredentials
 
-spotify = Spotify(auth_manager=SpotifyClientCredentials(
-    client_id=config.get("api", {}).get("spotify", {}).get("CLIENT_ID"),
-    client_secret=config.get("api", {}).get("spotify", {}).get("CLIENT_SECRET")
+
+class TokenStoreCacheHandler(CacheHandler):
+    """spotipy cache handler backed by utils.token_store, so the client credentials
+    token survives across processes instead of being requested on every start.
+    Tokens are saved without locking: SharedClientCredentials already holds token_lock()."""
+
+    def __init__(self, client_id: str):
+        self.key = f"spotify:{client_id}"
+        self._token_info = None
+
+    def get_cached_token(self):
+        # spotipy asks before every API call, only go to disk when the in-memory token expired
+        if self._token_info is None or self._token_info.get("expires_at", 0) <= time.time():
+            self._token_info = load_token(self.key)
+        return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        self._token_info = token_info
+        save_token(self.key, token_info)
+
+class SharedClientCredentials(SpotifyClientCredentials):
+    """Client credentials flow that holds token_lock() across reading the token store,
+    requesting a new token and saving it, so concurrent processes share one token."""
+
+    def get_access_token(self, as_dict=True, check_cache=True):
+        token_info = self.cache_handler.get_cached_token()
+        if check_cache and token_info and not self.is_token_expired(token_info):
+            return token_info if as_dict else token_info["access_token"]
+        with token_lock():
+            # the cache is checked again under the lock: another process may just have stored a token
+            return super().get_access_token(as_dict=as_dict, check_cache=check_cache)
+
+
+SPOTIFY_CLIENT_ID = config.get("api", {}).get("spotify", {}).get("CLIENT_ID")
+
+spotify = Spotify(auth_manager=SharedClientCredentials(
+    client_id=SPOTIFY_CLIENT_ID,
+    client_secret=config.get("api", {}).get("spotify", {}).get("CLIENT_SECRET"),
+    cache_handler=TokenStoreCacheHandler(SPOTIFY_CLIENT_ID)
 ))
 
 def get_spotify_artist_id(name: str=None, url: str=None):
@@ -20,6 +60,11 @@ def get_spotify_artist_id(name: str=None, url: str=None):
     return None
 
 def get_spotify_discography(artist_id: str, include_feats=False, include_full_album_if_featured=False) -> list[dict]:
+    return [t for batch in iter_spotify_discography(artist_id, include_feats, include_full_album_if_featured) for t in batch]
+
+def iter_spotify_discography(artist_id: str, include_feats=False, include_full_album_if_featured=False):
+    """Streaming variant of get_spotify_discography: yields lists of track dicts as the
+    album batches come in (one batch per ISRC lookup page when matching.isrc is on)."""
     print(f"Fetching Spotify discography for artist ID '{artist_id}'...")
     albums = []
     results = spotify.artist_albums(artist_id, album_type="album,single,compilation,appears_on", limit=50)
@@ -28,11 +73,20 @@ def get_spotify_discography(artist_id: str, include_feats=False, include_full_al
         results = spotify.next(results)
         albums.extend(results["items"])
 
-    tracks = []
+    if get_config().get("spotify", {}).get("collapse_album_editions", True):
+        album_pairs = _iter_album_editions(albums)
+    else:
+        album_pairs = zip(albums, _iter_full_albums([album["id"] for album in albums]))
+    fill_isrcs = get_config().get("matching", {}).get("isrc", True)
+
+    pending = []
+    tracks_found = 0
     seen_track_ids = set()
-    for album in albums:
-        album_data = spotify.album(album["id"])
+    for album, album_data in album_pairs:
+        if not album_data:
+            continue
         album_name = album.get("name")
+        album_url = album_data.get("external_urls", {}).get("spotify")
         
         for t in album_data["tracks"]["items"]:
             # skip exact duplicate track objects by Spotify track id
@@ -61,22 +115,116 @@ def get_spotify_discography(artist_id: str, include_feats=False, include_full_al
             duration_ms = t.get("duration_ms", None)
             
             seen_track_ids.add(t.get("id"))
-            tracks.append({
+            pending.append({
                 "title": t["name"],
+                "normalized_title": normalize_title_for_similarity(t["name"], "Spotify"),
                 "album": album_name,
+                "album_url": album_url,                   # lets the downloader fetch a whole album at once
+                "album_track_count": album_data.get("total_tracks"),
                 "artists": [artist["name"] for artist in t.get("artists", [])],
                 "track_number": t.get("track_number"),
                 "disc_number": t.get("disc_number"),
                 "duration": duration_ms/1000 if duration_ms else None,
                 "duration_ms": duration_ms,
                 "uri": t.get("uri"),
+                "isrc": None,                            # filled from full track objects below
                 "url": t.get("external_urls", {}).get("spotify"),
                 "provider_id": t.get("id"),               # spotify track id
                 "source": "Spotify"
             })
-    data = {"tracks_found": len(tracks), "albums_collected": len(albums)}
+
+        # hold tracks back until a full page of ISRC lookups (50) is ready, so streaming
+        # costs no extra requests; without ISRCs every album goes out right away
+        if not fill_isrcs and pending:
+            tracks_found += len(pending)
+            yield pending
+            pending = []
+        while fill_isrcs and len(pending) >= 50:
+            batch, pending = pending[:50], pending[50:]
+            _fill_spotify_isrcs(batch)
+            tracks_found += len(batch)
+            yield batch
+
+    if pending:
+        if fill_isrcs:
+            _fill_spotify_isrcs(pending)
+        tracks_found += len(pending)
+        yield pending
+
+    data = {"tracks_found": tracks_found, "albums_collected": len(albums)}
     print(data)
-    return tracks
+
+def _iter_full_albums(album_ids: list[str]):
+    """Fetch full album objects 20 at a time (several-albums endpoint), yielding them in the order given.
+    Embedded track listings stop at 50 items, the remaining pages are followed and appended."""
+    for i in range(0, len(album_ids), 20):
+        for album_data in spotify.albums(album_ids[i:i + 20]).get("albums", []):
+            if album_data:
+                page = album_data["tracks"]
+                while page.get("next"):
+                    page = spotify.next(page)
+                    album_data["tracks"]["items"].extend(page["items"])
+            yield album_data
+
+def _edition_key(album: dict) -> tuple:
+    # regional/deluxe re-listings of the same release share name, date, track count and main artist
+    artists = album.get("artists") or [{}]
+    return (
+        normalize_title_for_similarity(album.get("name") or "", "Spotify"),
+        album.get("release_date"),
+        album.get("total_tracks"),
+        artists[0].get("id"),
+    )
+
+def _iter_album_editions(albums: list[dict]):
+    """Group duplicate editions of the same release and fetch one representative per group.
+
+    The first edition of each group is fetched; only when it comes back missing or with
+    fewer tracks than announced (e.g. unavailable tracks) is the next edition of that group
+    tried, keeping whichever listing is the most complete.
+    Yields (album, full album object) pairs as soon as a group is settled: in the original
+    album order, except that groups needing another edition come after the first round.
+    """
+    groups: dict[tuple, list[dict]] = {}
+    for album in albums:
+        groups.setdefault(_edition_key(album), []).append(album)
+    groups = list(groups.values())
+
+    def track_count(album_data):
+        return len(album_data["tracks"]["items"]) if album_data else -1
+
+    chosen = [0] * len(groups)
+    best: list[tuple] = [None] * len(groups)
+    pending = list(range(len(groups)))
+    while pending:
+        widen = []
+        fetched = _iter_full_albums([groups[g][chosen[g]]["id"] for g in pending])
+        for g, album_data in zip(pending, fetched):
+            if best[g] is None or track_count(album_data) > track_count(best[g][1]):
+                best[g] = (groups[g][chosen[g]], album_data)
+            # widen only the groups whose best listing is still incomplete and have editions left
+            if track_count(best[g][1]) < (best[g][0].get("total_tracks") or 0) and chosen[g] + 1 < len(groups[g]):
+                widen.append(g)
+            else:
+                yield best[g]
+        pending = widen
+        for g in pending:
+            chosen[g] += 1
+
+    fetched_count = sum(c + 1 for c in chosen)
+    print(f"Collapsed {len(albums)} Spotify albums into {len(groups)} editions ({fetched_count} fetched)")
+
+def _fill_spotify_isrcs(tracks: list[dict]):
+    """Album track listings are simplified objects without external_ids,
+    fetch the full track objects (50 per call) to get their ISRC."""
+    ids = [t["provider_id"] for t in tracks if t.get("provider_id")]
+    isrcs = {}
+    for i in range(0, len(ids), 50):
+        for full in spotify.tracks(ids[i:i + 50]).get("tracks", []):
+            if full and full.get("id"):
+                isrcs[full["id"]] = normalize_isrc(full.get("external_ids", {}).get("isrc"))
+    for t in tracks:
+        t["isrc"] = isrcs.get(t.get("provider_id"))
 
 
 if __name__ == "__main__":
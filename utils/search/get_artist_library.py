@@ -1,8 +1,15 @@
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from utils.config import config, get_config
 from utils import is_match
 from utils import get_spotify_artist_id, get_deezer_artist_id, get_soundcloud_artist_permalink
-from utils import get_spotify_discography, get_deezer_discography, get_soundcloud_discography
-from utils import get_missing
+from utils import iter_spotify_discography, iter_deezer_discography, iter_soundcloud_discography
+from utils import missing_checker
+from utils.match_index import TitleIndex
+from utils.library import get_local_library
+from utils.ledger import DownloadLedger
 
 SOUNDCLOUD_CLIENT_ID = config.get("api", {}).get("soundcloud", {}).get("CLIENT_ID")
 SOUNDCLOUD_CLIENT_SECRET = config.get("api", {}).get("soundcloud", {}).get("CLIENT_SECRET")
@@ -14,79 +21,251 @@ INCLUDE_FEATURING_TRACKS = config.get("include_featuring_tracks", True)
 INCLUDE_FULL_ALBUMS_IF_FEATURED = config.get("include_full_album_if_featured", True)
 INCLUDE_ONLY_MISSING = config.get("include_only_missing", True)
 
-def merge_and_deduplicate(spotify_tracks, deezer_tracks, soundcloud_tracks) -> list[dict]:
+class IncrementalMerger:
     """
-    Merge and dedupe:
-      - If provider_id matches -> same track
-      - Else if duration diff ≤ tolerance and title similarity ≥ threshold -> duplicate
-      - Prefer Spotify version in conflicts
-      - Ensure Spotify entries (priority) prevent Deezer duplicates from being added
+    merge_and_deduplicate for tracks that arrive out of order, while providers are still fetching.
+
+    Tracks are merged in exactly the order the batch merge would see them: the highest
+    priority source that has not finished yet is merged as its tracks come in, lower
+    priority sources are buffered until every source ahead of them has finished. A track
+    handed out by take() is therefore final (nothing arriving later can displace it) and
+    result() equals merge_and_deduplicate over the same tracks.
+
+    Usage:
+        merger = IncrementalMerger(["spotify", "deezer"])
+        merger.add("deezer", tracks)    # buffered until spotify is finished
+        merger.add("spotify", tracks)
+        merger.finish("spotify")        # deezer's buffered tracks get merged
+        new_tracks = merger.take()
     """
-    priority_order = get_config().get('platform_priority_order')
-    merged = []
 
-    def provider_key(src, pid):
-        return f"{src.lower()}:{pid}" if pid else None
+    def __init__(self, sources=("spotify", "deezer", "soundcloud")):
+        priority_order = get_config().get('platform_priority_order')
+        sources = {s.lower() for s in sources}
+        # sources outside platform_priority_order are ignored, like merge_and_deduplicate does
+        self.order = [s for s in priority_order if s.lower() in sources]
+        self._top_source = priority_order[0]
+        self._buffers = {s.lower(): [] for s in self.order}
+        self._finished = set()
+        self._current = 0
+        self._taken = 0
+        self.merged = []
+
+        # Indexes over `merged`, so each incoming track is only compared against a handful of candidates:
+        #   - ISRC -> sources already merged with it (exact join ahead of fuzzy matching)
+        #   - duration buckets (+ title trigrams when matching.title_candidates > 0) for is_match
+        self._use_isrc = get_config().get("matching", {}).get("isrc", True)
+        self._isrc_sources: dict[str, set] = {}
+        self._title_index = TitleIndex()
+
+    @property
+    def done(self) -> bool:
+        return self._current >= len(self.order)
+
+    def add(self, source: str, tracks: list[dict]):
+        """Feed tracks fetched from `source`, in that provider's own order."""
+        key = source.lower()
+        if key not in self._buffers:
+            return
+        if not self.done and self.order[self._current].lower() == key:
+            for t in tracks:
+                self._add_track(t, source_hint=self.order[self._current])
+        else:
+            self._buffers[key].extend(tracks)
 
-    def add_track(t, source_hint: str = None):
+    def finish(self, source: str):
+        """Mark `source` as complete, releasing the buffered sources that were waiting on it."""
+        self._finished.add(source.lower())
+        while not self.done and self.order[self._current].lower() in self._finished:
+            self._current += 1
+            if not self.done:
+                next_source = self.order[self._current]
+                buffered, self._buffers[next_source.lower()] = self._buffers[next_source.lower()], []
+                for t in buffered:
+                    self._add_track(t, source_hint=next_source)
+
+    def take(self) -> list[dict]:
+        """Return the tracks merged since the previous call."""
+        new_tracks = self.merged[self._taken:]
+        self._taken = len(self.merged)
+        return new_tracks
+
+    def result(self) -> list[dict]:
+        return self.merged
+
+    def _add_track(self, t, source_hint: str = None):
         # Ensure track has a consistent "source" value (e.g. "Spotify")
         src = t.get("source") or (source_hint.capitalize() if source_hint else "")
         t["source"] = src
 
         # Duplicate prevention
-        if src.lower() != priority_order[0]:
-            for existing in merged:
-                if existing.get("source") == t.get("source"):
-                    continue
+        if src.lower() != self._top_source:
+            isrc = t.get("isrc") if self._use_isrc else None
+            if isrc and self._isrc_sources.get(isrc, set()) - {src}:
+                print(f"Skipping track '{t['title']}' ({t['source']}) due to existing ISRC match {isrc}")
+                return
+
+            for existing in self._title_index.candidates(t, accept=lambda e: e.get("source") != src):
                 if is_match(existing, t):
                     print(f"Skipping track '{t['title']}' ({t['source']}) due to existing {existing['source']} match '{existing['title']}'")
                     return
 
         # Not duplicate -> add and index
-        merged.append(t)
-
-    # Process tracks from all sources
-    source_map = {
-        "spotify": spotify_tracks,
-        "deezer": deezer_tracks,
-        "soundcloud": soundcloud_tracks,
-    }
-    for source in priority_order:
-        for t in source_map.get(source.lower(), []):
-            add_track(t, source_hint=source)
+        self.merged.append(t)
+        if self._use_isrc and t.get("isrc"):
+            self._isrc_sources.setdefault(t["isrc"], set()).add(src)
+        self._title_index.add(t)
 
-    return merged
+def merge_and_deduplicate(spotify_tracks, deezer_tracks, soundcloud_tracks) -> list[dict]:
+    """
+    Merge and dedupe:
+      - If provider_id matches -> same track
+      - Else if ISRC matches -> duplicate
+      - Else if duration diff ≤ tolerance and title similarity ≥ threshold -> duplicate
+      - Prefer Spotify version in conflicts
+      - Ensure Spotify entries (priority) prevent Deezer duplicates from being added
+    """
+    merger = IncrementalMerger()
+    for source, tracks in (("spotify", spotify_tracks), ("deezer", deezer_tracks), ("soundcloud", soundcloud_tracks)):
+        merger.add(source, tracks)
+        merger.finish(source)
+    return merger.result()
 
 def get_artist_library(
         artist_name: str = None,
         artist_url: str = None,
         include_featuring_tracks=INCLUDE_FEATURING_TRACKS,
         include_full_album_if_featured=INCLUDE_FULL_ALBUMS_IF_FEATURED,
-        include_only_missing=INCLUDE_ONLY_MISSING
+        include_only_missing=INCLUDE_ONLY_MISSING,
+        library=None
     ) -> list[dict]:
     """
     Return a list of all tracks for an artist, deduplicated and merged from multiple sources.
+    Missing tracks are checked against `library` (defaults to the running LocalLibrary, if any)
+    instead of rescanning the music directory.
+    """
+    return list(iter_artist_library(
+        artist_name, artist_url, include_featuring_tracks, include_full_album_if_featured, include_only_missing, library
+    ))
+
+class _Cancelled(Exception):
+    """Raised in a provider thread once iter_artist_library's consumer has stopped."""
+
+def iter_artist_library(
+        artist_name: str = None,
+        artist_url: str = None,
+        include_featuring_tracks=INCLUDE_FEATURING_TRACKS,
+        include_full_album_if_featured=INCLUDE_FULL_ALBUMS_IF_FEATURED,
+        include_only_missing=INCLUDE_ONLY_MISSING,
+        library=None,
+        queue_size: int = 0
+    ):
+    """
+    Streaming variant of get_artist_library, yielding the same tracks in the same order.
+    Providers stream their discographies concurrently into an IncrementalMerger, and each
+    track is checked against the local library as soon as its merge is final, so the first
+    (missing) tracks come out while the rest is still being fetched.
+
+    With queue_size > 0 at most that many fetched batches wait to be merged: when the
+    consumer falls behind, the provider threads block instead of buffering everything.
     """
     
     print(f"Fetching data for {artist_name}...")
     
     if artist_name and not artist_url:
-        id_spotify = get_spotify_artist_id(name=artist_name) if FETCH_FROM_SPOTIFY else None
-        id_deezer = get_deezer_artist_id(name=artist_name) if FETCH_FROM_DEEZER else None
-        id_soundcloud = get_soundcloud_artist_permalink(name=artist_name) if FETCH_FROM_SOUNDCLOUD else None
-    elif artist_url:
-        if "open.spotify.com" in artist_url:
-            id_spotify = get_spotify_artist_id(url=artist_url) if FETCH_FROM_SPOTIFY else None
-        
-        # id_deezer = get_deezer_artist_id(url=artist_url) if FETCH_FROM_DEEZER else None
-        # id_soundcloud = get_soundcloud_artist_permalink(url=artist_url) if FETCH_FROM_SOUNDCLOUD else None
-        id_deezer = None
-        id_soundcloud = None
-    
-    merged = merge_and_deduplicate(
-        get_spotify_discography(id_spotify, include_featuring_tracks, include_full_album_if_featured) if FETCH_FROM_SPOTIFY else [],
-        get_deezer_discography(id_deezer, include_featuring_tracks, include_full_album_if_featured) if FETCH_FROM_DEEZER else [],
-        get_soundcloud_discography(id_soundcloud) if FETCH_FROM_SOUNDCLOUD else []
-    )
-    
-    return get_missing(merged, LOCAL_MUSIC_DIR) if include_only_missing else merged
+        resolvers = {
+            "spotify": lambda: get_spotify_artist_id(name=artist_name),
+            "deezer": lambda: get_deezer_artist_id(name=artist_name),
+            "soundcloud": lambda: get_soundcloud_artist_permalink(artist_name),
+        }
+    else:
+        resolvers = {
+            "spotify": lambda: get_spotify_artist_id(url=artist_url) if "open.spotify.com" in artist_url else None,
+            # "deezer": lambda: get_deezer_artist_id(url=artist_url),
+            # "soundcloud": lambda: get_soundcloud_artist_permalink(url=artist_url),
+            "deezer": lambda: None,
+            "soundcloud": lambda: None,
+        }
+    fetchers = {
+        "spotify": lambda artist_id: iter_spotify_discography(artist_id, include_featuring_tracks, include_full_album_if_featured),
+        "deezer": lambda artist_id: iter_deezer_discography(artist_id, include_featuring_tracks, include_full_album_if_featured),
+        "soundcloud": lambda artist_id: iter_soundcloud_discography(artist_id),
+    }
+    enabled = {
+        "spotify": FETCH_FROM_SPOTIFY,
+        "deezer": FETCH_FROM_DEEZER,
+        "soundcloud": FETCH_FROM_SOUNDCLOUD,
+    }
+    # (provider, batch of tracks, error); a None batch marks the end of that provider
+    results = queue.Queue(maxsize=queue_size)
+    cancelled = threading.Event()
+
+    def put(item):
+        # a blocked put must not outlive a consumer that stopped iterating
+        while not cancelled.is_set():
+            try:
+                results.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                pass
+        raise _Cancelled()
+
+    def fetch_provider(provider: str):
+        # resolve the artist ID, then stream the discography, timing both steps
+        try:
+            start = time.perf_counter()
+            artist_id = resolvers[provider]()
+            resolved = time.perf_counter()
+            if not artist_id:
+                print(f"[{provider}] no artist found ({resolved - start:.2f}s), skipping")
+            else:
+                count = 0
+                for batch in fetchers[provider](artist_id):
+                    if count == 0:
+                        print(f"[{provider}] first tracks after {time.perf_counter() - start:.2f}s")
+                    count += len(batch)
+                    put((provider, batch, None))
+                print(f"[{provider}] artist ID resolved in {resolved - start:.2f}s, {count} tracks fetched in {time.perf_counter() - resolved:.2f}s")
+        except _Cancelled:
+            print(f"[{provider}] cancelled")
+        except Exception as e:
+            put((provider, None, e))
+        else:
+            put((provider, None, None))
+
+    # providers run concurrently: wall time is the slowest provider instead of the sum
+    providers = [p for p, on in enabled.items() if on]
+    merger = IncrementalMerger(providers)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, len(providers))) as executor:
+        try:
+            for provider in providers:
+                executor.submit(fetch_provider, provider)
+
+            # index the local library while the first pages are on their way
+            is_missing = None
+            if include_only_missing:
+                if library is None:
+                    library = get_local_library()
+                missing_locally = missing_checker(LOCAL_MUSIC_DIR, library)
+                # tracks downloaded before are dropped through the ledger, ahead of any matching
+                ledger = DownloadLedger()
+                is_missing = lambda t: not ledger.knows(t) and missing_locally(t)
+
+            remaining = len(providers)
+            while remaining:
+                provider, batch, error = results.get()
+                if error is not None:
+                    raise error
+                if batch is None:
+                    merger.finish(provider)
+                    remaining -= 1
+                else:
+                    merger.add(provider, batch)
+                # merger.take() only returns tracks whose merge is final, in platform_priority_order
+                for t in merger.take():
+                    if is_missing is None or is_missing(t):
+                        yield t
+        finally:
+            cancelled.set()
+    print(f"Fetched {len(providers)} providers in {time.perf_counter() - start:.2f}s")
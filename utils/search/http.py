@@ -0,0 +1,75 @@
+import time
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledClient:
+    """HTTP client safe to share between threads, with keep-alive connection reuse.
+
+    A single HTTPAdapter (a thread-safe urllib3 pool manager holding up to
+    `pool_size` connections per host) is mounted into one requests.Session per
+    thread, so connections are reused across threads without sharing a Session's
+    mutable state. With pool_block, extra threads wait for a free connection
+    instead of opening throwaway ones.
+    """
+
+    def __init__(self, pool_size: int = 10):
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Connection reuse counters summed over every host pool:
+        connections opened, requests sent and requests that reused a kept-alive connection."""
+        pools = self.adapter.poolmanager.pools
+        connections = requests_sent = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            requests_sent += pool.num_requests
+        return {"connections": connections, "requests": requests_sent, "reused": requests_sent - connections}
+
+
+class RateLimiter:
+    """Sliding-window rate limiter shared between threads: at most `max_calls`
+    calls per `period` seconds. acquire() blocks until a slot is free."""
+
+    def __init__(self, max_calls: int, period: float):
+        self.max_calls = max_calls
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and self._calls[0] <= now - self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.max_calls:
+                    self._calls.append(now)
+                    return
+                wait = self._calls[0] + self.period - now
+            time.sleep(wait)
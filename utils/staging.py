@@ -0,0 +1,59 @@
+import os
+import sys
+import errno
+import shutil
+import ctypes
+from .config import get_config
+
+# Hidden directory under output.base_directory where downloads are staged when
+# temp_directory lives on another filesystem. Library scans and the watcher skip it.
+STAGING_DIR_NAME = ".staging"
+
+
+def _same_device(a: str, b: str) -> bool:
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return False
+
+def get_staging_root(config: dict = None) -> str:
+    """Directory to create download job directories in.
+
+    download.staging in config.json: "temp" always stages in temp_directory, "output" in a
+    hidden directory under output.base_directory, and "auto" (the default) uses temp_directory
+    only when it is on the same filesystem as the output, so finalizing is a rename instead
+    of a copy plus delete."""
+    config = config or get_config()
+    temp_directory = config['temp_directory']
+    base_directory = config['output']['base_directory']
+    mode = config.get("download", {}).get("staging", "auto")
+    if mode == "temp" or (mode == "auto" and _same_device(temp_directory, base_directory)):
+        return temp_directory
+
+    staging = os.path.join(base_directory, STAGING_DIR_NAME)
+    os.makedirs(staging, exist_ok=True)
+    if sys.platform == "win32":
+        ctypes.windll.kernel32.SetFileAttributesW(staging, 0x2)  # FILE_ATTRIBUTE_HIDDEN
+    return staging
+
+def is_staging_path(path: str) -> bool:
+    return STAGING_DIR_NAME in os.path.normpath(path).split(os.sep)
+
+def finalize(staged_path: str, final_path: str):
+    """Move a finished download into place with a single atomic os.replace, so the file
+    shows up complete or not at all. Should staging end up on another filesystem anyway,
+    the file is copied next to its destination under a hidden name first."""
+    try:
+        os.replace(staged_path, final_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        part_path = os.path.join(os.path.dirname(final_path), f".{os.path.basename(final_path)}.part")
+        try:
+            shutil.copy2(staged_path, part_path)
+            os.replace(part_path, final_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        os.remove(staged_path)
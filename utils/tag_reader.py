@@ -0,0 +1,79 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from mutagen import File as MutagenFile
+from .normalize import normalize_title_for_similarity, normalize_isrc
+
+# Tag parsing run by get_local_tracks' worker processes. Under the spawn and forkserver
+# start methods (Windows, macOS) every worker imports this module afresh, along with
+# utils/__init__ (which imports its exports lazily) and utils.normalize, so none of them
+# may do anything at import time beyond defining things.
+
+
+def _easy_tag(tags, key):
+    if not tags:
+        return None
+    val = tags.get(key)
+    if isinstance(val, (list, tuple)):
+        return val[0] if val else None
+    return val
+
+def read_track(path: str, fname: str) -> Optional[Dict]:
+    """Open a single audio file with mutagen and build its track dict.
+    Returns None if mutagen cannot read the file."""
+    try:
+        audio = MutagenFile(path, easy=True)
+    except Exception:
+        # skip files that mutagen cannot read
+        return None
+
+    tags = getattr(audio, "tags", None) or {}
+    title = _easy_tag(tags, "title") or os.path.splitext(fname)[0]
+    artist = _easy_tag(tags, "artist")
+    album = _easy_tag(tags, "album")
+    tracknumber = _easy_tag(tags, "tracknumber")
+    discnumber = _easy_tag(tags, "discnumber")
+    date = _easy_tag(tags, "date") or _easy_tag(tags, "year") or _easy_tag(tags, "originaldate")
+    genre = _easy_tag(tags, "genre")
+    albumartist = _easy_tag(tags, "albumartist")
+    composer = _easy_tag(tags, "composer")
+    comment = _easy_tag(tags, "comment")
+    isrc = normalize_isrc(_easy_tag(tags, "isrc"))
+
+    duration = None
+    try:
+        info = getattr(audio, "info", None)
+        if info is not None and getattr(info, "length", None) is not None:
+            duration = float(info.length)
+    except Exception:
+        duration = None
+
+    normalized_title = normalize_title_for_similarity(title)
+
+    return {
+        "path": path,
+        "filename": fname,
+        "title": title,
+        "artist": artist,
+        "album": album,
+        "track_number": tracknumber,
+        "track": tracknumber.split('/')[0] if tracknumber else None,
+        "total_tracks": tracknumber.split('/')[1] if tracknumber and '/' in tracknumber else None,
+        "disc_number": discnumber,
+        "date": date,
+        "genre": genre,
+        "album_artist": albumartist,
+        "composer": composer,
+        "comment": comment,
+        "isrc": isrc,
+        "duration": duration,
+        "duration_ms": int(duration * 1000) if duration else None,
+        "normalized_title": normalized_title,
+        "source": "Local",
+        "provider_id": None,
+        # keep raw tags for any additional metadata consumers may want
+        "raw_tags": dict(tags) if tags else {},
+    }
+
+def read_tracks(batch: List[Tuple[str, str]]) -> List[Optional[Dict]]:
+    """Process pool entry point of the parallel scan: parse a chunk of (path, filename) pairs."""
+    return [read_track(path, fname) for path, fname in batch]
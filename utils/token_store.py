@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import tempfile
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+from .cache import get_cache_directory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# On-disk store for OAuth access tokens shared by every process (CLI runs, GUI).
+# Only access tokens and their expiry are written, never client secrets.
+TOKEN_FILE = "tokens.json"
+
+
+def _token_path() -> str:
+    return os.path.join(get_cache_directory(), TOKEN_FILE)
+
+@contextmanager
+def token_lock():
+    """Exclusive inter-process lock around the token store.
+    Hold it across "read, authenticate if expired, save" so concurrent processes
+    don't all request a new token at once."""
+    fd = os.open(_token_path() + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # msvcrt.LK_LOCK retries for ~10 seconds before raising
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        os.close(fd)
+
+def _read_all() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(_token_path(), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_token(key: str) -> Optional[Dict[str, Any]]:
+    """Return the stored token info for `key` if it has not expired yet, else None."""
+    token_info = _read_all().get(key)
+    if token_info and token_info.get("expires_at", 0) > time.time():
+        return token_info
+    return None
+
+def save_token(key: str, token_info: Dict[str, Any]):
+    """Store token info (must include 'expires_at', epoch seconds) under `key`.
+    Call while holding token_lock(); the file is replaced atomically and is only
+    readable by the current user."""
+    tokens = _read_all()
+    now = time.time()
+    # drop expired entries while we're at it
+    tokens = {k: v for k, v in tokens.items() if v.get("expires_at", 0) > now}
+    tokens[key] = token_info
+
+    path = _token_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tokens-")  # created 0600
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,89 @@
+import os
+import json
+from typing import Dict, Optional
+from .cache import open_cache_db
+
+# Bump when the shape of the track dicts built by local_tracks changes (or
+# normalize_title_for_similarity does, since normalized_title is stored too),
+# so rows written by an older version get re-parsed instead of reused.
+CACHE_VERSION = 2
+
+
+class TrackCache:
+    """Persistent cache of parsed local tracks for one library root.
+
+    Entries are keyed by (path, size, mtime_ns): a file whose size or mtime
+    changed is treated as a miss and re-parsed. Files mutagen could not read
+    are cached as an empty dict so they are not re-opened on every scan.
+    Rows for files that were not seen during the scan are evicted on close().
+
+    Usage:
+        with TrackCache(local_directory) as cache:
+            track = cache.get(path, size, mtime_ns)
+            if track is None:
+                track = parse(path) or {}
+                cache.put(path, size, mtime_ns, track)
+            cache.mark_seen(path)
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.conn = open_cache_db("library")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            " root TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (root, path))"
+        )
+        # load every row for this root up front: one query instead of one per file
+        self._entries = {
+            path: (size, mtime_ns, version, data)
+            for path, size, mtime_ns, version, data in self.conn.execute(
+                "SELECT path, size, mtime_ns, version, data FROM tracks WHERE root = ?",
+                (self.root,)
+            )
+        }
+        self._seen = set()
+        self._pending = []
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # only evict after a complete scan, a crash mid-walk would otherwise wipe the cache
+        self.close(evict=exc_type is None)
+
+    def get(self, path: str, size: int, mtime_ns: int) -> Optional[Dict]:
+        entry = self._entries.get(path)
+        if entry and entry[0] == size and entry[1] == mtime_ns and entry[2] == CACHE_VERSION:
+            self.hits += 1
+            return json.loads(entry[3])
+        self.misses += 1
+        return None
+
+    def put(self, path: str, size: int, mtime_ns: int, track: Dict):
+        data = json.dumps(track, default=str)
+        self._entries[path] = (size, mtime_ns, CACHE_VERSION, data)
+        self._pending.append((self.root, path, size, mtime_ns, CACHE_VERSION, data))
+
+    def mark_seen(self, path: str):
+        self._seen.add(path)
+
+    def close(self, evict: bool = True):
+        with self.conn:
+            if self._pending:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO tracks (root, path, size, mtime_ns, version, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    self._pending
+                )
+            if evict:
+                stale = [(self.root, p) for p in self._entries if p not in self._seen]
+                if stale:
+                    self.conn.executemany("DELETE FROM tracks WHERE root = ? AND path = ?", stale)
+        self.conn.close()